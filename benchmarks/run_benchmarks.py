@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+"""
+Measure the throughput and overhead of the computation modes of
+BatchComputation, using synthetic plugins and inputs.
+
+Usage:
+  run_benchmarks.py [options]
+  run_benchmarks.py run-one <plugin> <idsfile> <mode> [options]
+
+Each combination of synthetic plugin (see synthetic.py), number of
+input IDs and computation mode is run in a separate process, so that
+the startup time and the peak memory are measured for that run only.
+
+For each run, the following is reported (TSV, with a header line):
+  - wall_s:               time of BatchComputation.run()
+  - units_per_s:          input units per second (n_units / wall_s)
+  - overhead_us:          approximate per-unit overhead, i.e. wall time per
+                          unit, times the number of workers, minus the time
+                          of the plugin compute function per unit
+  - startup_s:            time from the start of the script to the first
+                          computed unit (imports, plugin loading,
+                          computation setup, worker startup)
+  - peak_rss_main_mib:    peak resident memory of the main process
+  - peak_rss_workers_mib: peak resident memory of the largest worker process
+                          (0 if no worker processes are used)
+
+If a baseline file (results of a previous run) is given, the runs are
+compared to it, and those whose units_per_s decreased by more than the
+tolerance are flagged in the regression column.
+
+Options:
+  --plugins LIST    comma-separated synthetic plugin kinds
+                    [default: noop,cpu,io,state]
+  --sizes LIST      comma-separated numbers of input IDs (e.g. up to 10000000)
+                    [default: 1000,10000,100000]
+  --modes LIST      comma-separated computation modes (default: all modes
+                    except slurm)
+  --chunk-size N    chunk size of the parallel and threads modes
+  --repeat N        number of repetitions of each run; the run with the
+                    highest throughput is reported [default: 1]
+  --out FNAME       write the results also to this file
+  --baseline FNAME  results file of a previous run, for detecting regressions
+  --tolerance F     relative decrease of units_per_s flagged as regression
+                    [default: 0.2]
+  --workdir DIR     directory for the synthetic plugins and inputs
+                    (default: a temporary directory)
+  --verbose, -v     be verbose
+  --help, -h        show this help message
+"""
+
+import time
+PROCESS_START = time.time()
+
+import os
+import sys
+import json
+import resource
+import tempfile
+import subprocess
+from docopt import docopt
+from schema import Schema, Or, And, Use
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import synthetic
+
+COLUMNS = ["plugin", "n_units", "mode", "wall_s", "units_per_s",
+           "overhead_us", "startup_s", "peak_rss_main_mib",
+           "peak_rss_workers_mib"]
+N_COMPUTE_SAMPLES = 100
+
+def validated(args):
+  return Schema({"--plugins": And(Use(lambda s: s.split(",")),
+                    lambda kinds: all(kind in synthetic.PLUGIN_KINDS \
+                                      for kind in kinds)),
+                 "--sizes": And(Use(lambda s: [int(n) for n in s.split(",")]),
+                                lambda sizes: all(n > 0 for n in sizes)),
+                 "--chunk-size": Or(None, And(Use(int), lambda n: n > 0)),
+                 "--repeat": And(Use(int), lambda n: n > 0),
+                 "--tolerance": And(Use(float), lambda f: f >= 0),
+                 object: object}).validate(args)
+
+def _maxrss_mib(who):
+  maxrss = resource.getrusage(who).ru_maxrss
+  return maxrss / (1 << 20) if sys.platform == "darwin" else maxrss / 1024
+
+def _n_workers(mode, batch_computation):
+  n_cpus = os.cpu_count() or 1
+  if mode == "parallel":
+    return n_cpus
+  elif mode == "threads":
+    return batch_computation.n_threads or min(32, n_cpus + 4)
+  elif mode == "async":
+    return batch_computation.concurrency or \
+        batch_computation.DEFAULT_CONCURRENCY
+  return 1
+
+def run_one(pluginfilename, idsfilename, mode, chunk_size):
+  """
+  Runs a single benchmark in the current process
+  and outputs the measurements as JSON.
+  """
+  from prenacs import BatchComputation
+  first_unit_time = None
+
+  class TimedBatchComputation(BatchComputation):
+    def _on_success(self, output_id, results, logs):
+      nonlocal first_unit_time
+      if first_unit_time is None:
+        first_unit_time = time.time()
+      super()._on_success(output_id, results, logs)
+  bc = TimedBatchComputation(pluginfilename)
+  bc.input_from_idsfile(idsfilename)
+  bc.set_parallel_params(chunk_size=chunk_size)
+  bc.set_output(os.devnull, os.devnull)
+  bc.setup_computation(reportfile=open(os.devnull, "w"))
+  with open(idsfilename) as f:
+    n_units = sum(1 for line in f)
+  start = time.time()
+  bc.run(mode=mode)
+  wall = time.time() - start
+  bc.finalize()
+  sample = [f"unit{i}" for i in range(min(n_units, N_COMPUTE_SAMPLES))]
+  compute_start = time.time()
+  for unit in sample:
+    bc.plugin.compute(unit, **bc.params)
+  compute_per_unit = (time.time() - compute_start) / len(sample)
+  overhead = wall * _n_workers(mode, bc) / n_units - compute_per_unit
+  json.dump({"n_units": n_units, "wall_s": wall,
+             "units_per_s": n_units / wall,
+             "overhead_us": overhead * 1e6,
+             "startup_s": first_unit_time - PROCESS_START,
+             "peak_rss_main_mib": _maxrss_mib(resource.RUSAGE_SELF),
+             "peak_rss_workers_mib": _maxrss_mib(resource.RUSAGE_CHILDREN)},
+            sys.stdout)
+
+def run_in_subprocess(pluginfilename, idsfilename, mode, chunk_size, verbose):
+  cmd = [sys.executable, __file__, "run-one", pluginfilename, idsfilename,
+         mode]
+  if chunk_size:
+    cmd += ["--chunk-size", str(chunk_size)]
+  out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE,
+                       stderr=None if verbose else subprocess.DEVNULL)
+  return json.loads(out.stdout)
+
+def read_results(filename):
+  with open(filename) as f:
+    header = f.readline().rstrip("\n").split("\t")
+    results = {}
+    for line in f:
+      row = dict(zip(header, line.rstrip("\n").split("\t")))
+      results[(row["plugin"], row["n_units"], row["mode"])] = row
+  return results
+
+def format_row(row, baseline, tolerance):
+  values = [str(row[c]) if isinstance(row[c], (str, int)) \
+              else f"{row[c]:.6g}" \
+              for c in COLUMNS]
+  if baseline is not None:
+    previous = baseline.get((row["plugin"], str(row["n_units"]), row["mode"]))
+    if previous is None:
+      values.append("new")
+    elif row["units_per_s"] < \
+        float(previous["units_per_s"]) * (1 - tolerance):
+      values.append("REGRESSION")
+    else:
+      values.append("ok")
+  return "\t".join(values) + "\n"
+
+def main(args):
+  if args["--workdir"]:
+    os.makedirs(args["--workdir"], exist_ok=True)
+    run_all(args, args["--workdir"])
+  else:
+    with tempfile.TemporaryDirectory(prefix="prenacs_bench") as workdir:
+      run_all(args, workdir)
+
+def run_all(args, workdir):
+  from prenacs import BatchComputation
+  modes = args["--modes"].split(",") if args["--modes"] else \
+      [m for m in BatchComputation.MODES if m != "slurm"]
+  baseline = read_results(args["--baseline"]) if args["--baseline"] else None
+  outfiles = [sys.stdout]
+  if args["--out"]:
+    outfiles.append(open(args["--out"], "w"))
+  header = COLUMNS + (["regression"] if baseline is not None else [])
+  for f in outfiles:
+    f.write("\t".join(header) + "\n")
+  for kind in args["--plugins"]:
+    pluginfilename = synthetic.write_plugin(kind, workdir)
+    for n_units in args["--sizes"]:
+      idsfilename = synthetic.write_ids(n_units, workdir)
+      for mode in modes:
+        if args["--verbose"]:
+          sys.stderr.write(f"# running: {kind}, {n_units} units, {mode}\n")
+        runs = [run_in_subprocess(pluginfilename, idsfilename, mode,
+                                  args["--chunk-size"], args["--verbose"]) \
+                  for i in range(args["--repeat"])]
+        row = max(runs, key=lambda r: r["units_per_s"])
+        row.update({"plugin": kind, "mode": mode})
+        line = format_row(row, baseline, args["--tolerance"])
+        for f in outfiles:
+          f.write(line)
+          f.flush()
+  for f in outfiles[1:]:
+    f.close()
+
+if __name__ == "__main__":
+  args = docopt(__doc__)
+  if args["run-one"]:
+    run_one(args["<plugin>"], args["<idsfile>"], args["<mode>"],
+            int(args["--chunk-size"]) if args["--chunk-size"] else None)
+  else:
+    main(validated(args))
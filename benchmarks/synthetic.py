@@ -0,0 +1,85 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+"""
+Generators of synthetic plugins and inputs for the benchmarks.
+
+Plugin kinds:
+  noop:  returns the input ID (measures the pure overhead of prenacs)
+  cpu:   CPU-bound busy loop (``work`` iterations per unit, default: 10000)
+  io:    I/O-bound, simulated by sleeping (``delay`` seconds per unit,
+         default: 0.001)
+  state: large state (``size_mb`` MiB, default: 64), created by initialize()
+         and read by compute()
+"""
+
+import os
+
+PLUGIN_HEADER = '''\
+ID = "bench_{kind}"
+VERSION = "1.0"
+INPUT = "ID"
+OUTPUT = ["value"]
+'''
+
+PLUGIN_BODY = {
+  "noop": '''
+def compute(unit, **kwargs):
+  return [unit], ""
+''',
+  "cpu": '''
+def compute(unit, work=10000, **kwargs):
+  x = 0
+  for i in range(work):
+    x += i * i
+  return [x], ""
+''',
+  "io": '''
+import time
+
+def compute(unit, delay=0.001, **kwargs):
+  time.sleep(delay)
+  return [unit], ""
+''',
+  "state": '''
+def initialize(size_mb=64):
+  return bytearray(b"x" * (size_mb << 20))
+
+def compute(unit, state=None, **kwargs):
+  return [state[hash(unit) % len(state)]], ""
+''',
+}
+
+PLUGIN_KINDS = list(PLUGIN_BODY.keys())
+
+def write_plugin(kind, dirname):
+  """
+  Writes a synthetic plugin of the given kind to the given directory.
+
+  Returns:
+    str: The path of the plugin file.
+  """
+  if kind not in PLUGIN_BODY:
+    raise ValueError(f"Unknown synthetic plugin kind: {kind}; "+\
+                     "it must be one of: " + ", ".join(PLUGIN_KINDS))
+  filename = os.path.join(dirname, f"bench_{kind}.py")
+  with open(filename, "w") as f:
+    f.write(PLUGIN_HEADER.format(kind=kind) + PLUGIN_BODY[kind])
+  return filename
+
+def write_ids(n_units, dirname):
+  """
+  Writes an input IDs file with the given number of IDs to the given
+  directory, unless it already exists.
+
+  Returns:
+    str: The path of the IDs file.
+  """
+  filename = os.path.join(dirname, f"ids_{n_units}.txt")
+  if not os.path.exists(filename):
+    with open(filename, "w") as f:
+      block = 1 << 16
+      for start in range(0, n_units, block):
+        f.write("".join(f"unit{i}\n" \
+                        for i in range(start, min(start + block, n_units))))
+  return filename
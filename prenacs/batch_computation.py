@@ -3,16 +3,38 @@
 #
 import sys
 from pathlib import Path
-from glob import glob
-from time import sleep
+from glob import iglob
 from prenacs import plugins_helper, formatting_helper
 from prenacs.report import Report
+from prenacs.skip_index import SkipIndex
+from prenacs.results_cache import ResultsCache
+from prenacs.input_fingerprints import InputFingerprints
+from prenacs.shared_input import PreloadedInput
+from prenacs.input_list import IndexedInputList
+from prenacs.slurm_monitor import SlurmArrayMonitor
+from prenacs.results_writer import ResultsWriter
+from prenacs.columnar_results import ColumnarResultsWriter, results_columns, \
+                                     COLUMNAR_FORMATS
+from prenacs.error import PrenacsError, UnitTimeoutError, WorkerCrashError
 import tqdm
-from concurrent.futures import as_completed, ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, \
+                               Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic
+from functools import partial
+from itertools import islice, chain
 import multiplug
+import asyncio
+import inspect
 import tempfile
 import dill
 import os
+import multiprocessing.util
+import traceback
+import signal
+import resource
 import shutil
 import sh
 
@@ -20,30 +42,333 @@ class EntityProcessor():
   """
   A class that processes entities using a dumped plugin compute.
 
+  The plugin compute function and the parameters are deserialized only
+  once, when the entity processor is created. In the parallel mode,
+  an entity processor is created by the initializer of each worker process
+  (see ``_initialize_worker``), so that for each input unit only the
+  input ID must be passed to the worker.
+
+  If the dumped plugin compute_batch function is passed, it is used
+  for processing the input IDs of each chunk in a single call, instead
+  of the plugin compute function.
+
+  If the dumped plugin initialize function is passed, it is called
+  when the entity processor is created, passing the content of the
+  ``state`` parameter as keyword arguments, and the ``state`` parameter
+  is replaced by its return value. If the dumped plugin finalize function
+  is passed, it is called with the state, when the process exits.
+
+  If ``unit_timeout`` is set, the computation of each input ID is
+  interrupted by a UnitTimeoutError, after ``unit_timeout`` seconds
+  (for compute_batch: ``unit_timeout`` seconds times the number of input IDs).
+
   Attributes:
-    dumped_plugin_compute (bytes): The dumped plugin compute.
+    plugin_compute (function): The plugin compute function.
+    params (dict): The parameters to pass to the plugin compute.
+    unit_timeout (float): The time limit for the computation of an input ID.
 
   Methods:
-    run(input_id, params): Runs the plugin compute on the given input ID
-                           and parameters.
+    run(input_id): Runs the plugin compute on the given input ID.
+    run_chunk(input_ids): Runs the plugin compute (or compute_batch)
+                          on the given input IDs.
   """
 
-  def __init__(self, dumped_plugin_compute):
-    self.dumped_plugin_compute = dumped_plugin_compute
+  def __init__(self, dumped_plugin_compute, dumped_params,
+               dumped_plugin_initialize=None, dumped_plugin_finalize=None,
+               dumped_plugin_compute_batch=None, unit_timeout=None):
+    self.plugin_compute = dill.loads(dumped_plugin_compute)
+    self.params = dill.loads(dumped_params)
+    self.unit_timeout = unit_timeout
+    self.plugin_compute_batch = None
+    if dumped_plugin_compute_batch is not None:
+      self.plugin_compute_batch = dill.loads(dumped_plugin_compute_batch)
+    if dumped_plugin_initialize is not None:
+      plugin_initialize = dill.loads(dumped_plugin_initialize)
+      self.params["state"] = \
+          plugin_initialize(**self.params.get("state", {}))
+    if dumped_plugin_finalize is not None:
+      self.plugin_finalize = dill.loads(dumped_plugin_finalize)
+      multiprocessing.util.Finalize(self, self.finalize, exitpriority=10)
+
+  def finalize(self):
+    """
+    Runs the plugin finalize on the state of the entity processor.
+    """
+    self.plugin_finalize(self.params.get("state", None))
 
-  def run(self, input_id, params):
+  def run(self, input_id):
     """
-    Runs the plugin compute on the given input ID and parameters.
+    Runs the plugin compute on the given input ID.
 
     Args:
       input_id (str): The input ID.
-      params (dict): The parameters to pass to the plugin compute.
 
     Returns:
       Any: The output of the plugin compute.
     """
-    plugin_compute = dill.loads(self.dumped_plugin_compute)
-    return plugin_compute(input_id, **params)
+    return self.plugin_compute(input_id, **self.params)
+
+  def run_chunk(self, input_ids):
+    """
+    Runs the plugin compute on each of the given input IDs.
+
+    An exception raised by the plugin compute for an input ID does not
+    stop the processing of the remaining input IDs of the chunk.
+
+    If the plugin provides a compute_batch function, it is called
+    once for all input IDs of the chunk instead; an exception raised by it
+    is returned for all input IDs of the chunk.
+
+    Args:
+      input_ids (list): The input IDs.
+
+    Returns:
+      list: For each input ID, a tuple (output, exception), where
+            output is the output of the plugin compute, or None, if
+            an exception was raised.
+    """
+    return _run_chunk(self.plugin_compute, self.plugin_compute_batch,
+                      input_ids, self.params, self.unit_timeout)
+
+class FusedEntityProcessor():
+  """
+  A class that processes entities using the compute functions of
+  multiple plugins, in a single pass over the input units.
+
+  If an input loader function (``load_input``) is passed, it is called
+  once for each input ID and the returned object is passed, instead of the
+  input ID, to the compute functions of the plugins declaring to use
+  a shared input (SHARED_INPUT constant). If the input loader raises an
+  exception, it is returned as outcome of these plugins for the input ID.
+
+  If ``preloaded`` is set, the inputs were already loaded by the main
+  process: instead of the input IDs, PreloadedInput instances are passed
+  to ``run_chunk`` and the plugins using a shared input get a read-only
+  memoryview of the shared memory block containing the loaded input.
+
+  If ``unit_timeout`` is set, the loading of each input is limited to
+  ``unit_timeout`` seconds (a UnitTimeoutError is the outcome of the
+  plugins using the shared input, if the time limit is exceeded).
+
+  Attributes:
+    chunk_runners (list): For each plugin, a function computing a list of
+                          inputs and returning the outcomes (see
+                          ``EntityProcessor.run_chunk``).
+    shared_input (list): For each plugin, whether it uses the shared input.
+    load_input (function): The input loader function, or None.
+    preloaded (bool): Whether the inputs were loaded by the main process.
+    unit_timeout (float): The time limit for loading an input, or None.
+  """
+
+  def __init__(self, chunk_runners, shared_input, load_input=None,
+               preloaded=False, unit_timeout=None):
+    self.chunk_runners = chunk_runners
+    self.shared_input = shared_input
+    self.load_input = load_input
+    self.preloaded = preloaded
+    self.unit_timeout = unit_timeout
+
+  def _load_inputs(self, input_ids):
+    loaded = []
+    for input_id in input_ids:
+      try:
+        with _time_limit(self.unit_timeout):
+          loaded.append((self.load_input(input_id), None))
+      except Exception as exc:
+        loaded.append((None, _keep_traceback(exc)))
+    return loaded
+
+  def _run_on_loaded(self, run_chunk, loaded):
+    outcomes = [(None, exc) for data, exc in loaded]
+    valid = [i for i, (data, exc) in enumerate(loaded) if exc is None]
+    if valid:
+      for i, outcome in zip(valid, run_chunk([loaded[i][0] for i in valid])):
+        outcomes[i] = outcome
+    return outcomes
+
+  def run_chunk(self, input_ids):
+    """
+    Runs the compute functions of the plugins on the given input IDs
+    (or PreloadedInput instances, if ``preloaded`` is set).
+
+    Returns:
+      list: For each input ID, a list of the outcomes of the plugins,
+            i.e. tuples (output, exception), as in
+            ``EntityProcessor.run_chunk``.
+    """
+    if self.preloaded:
+      units = input_ids
+      try:
+        return self._run_plugins([unit.input_id for unit in units],
+                                 [unit.attach() for unit in units])
+      finally:
+        for unit in units:
+          unit.detach()
+    loaded = None
+    if self.load_input is not None and any(self.shared_input):
+      loaded = self._load_inputs(input_ids)
+    return self._run_plugins(input_ids, loaded)
+
+  def _run_plugins(self, input_ids, loaded):
+    outcomes = []
+    for run_chunk, shared_input in zip(self.chunk_runners, self.shared_input):
+      if shared_input and loaded is not None:
+        outcomes.append(self._run_on_loaded(run_chunk, loaded))
+      else:
+        outcomes.append(run_chunk(input_ids))
+    return [list(unit_outcomes) for unit_outcomes in zip(*outcomes)]
+
+def _run_compute_batch(plugin_compute_batch, input_ids, params):
+  """
+  Runs the plugin compute_batch function on a list of input IDs.
+
+  Returns:
+    list: The outputs of the plugin for each of the input IDs,
+          in the same order as the input IDs.
+
+  Raises:
+    PrenacsError: If the number of outputs is not the number of input IDs.
+  """
+  outputs = list(plugin_compute_batch(input_ids, **params))
+  if len(outputs) != len(input_ids):
+    raise PrenacsError(f"compute_batch returned {len(outputs)} outputs "+\
+                       f"for {len(input_ids)} input units")
+  return outputs
+
+TRACEBACK_ATTR = "prenacs_traceback"
+
+def _keep_traceback(exc):
+  """
+  Stores the formatted traceback of an exception in the exception itself,
+  so that it is not lost when the exception is passed from a worker process.
+  """
+  try:
+    setattr(exc, TRACEBACK_ATTR, traceback.format_exc())
+  except AttributeError:
+    pass
+  return exc
+
+def _traceback_text(exc):
+  text = getattr(exc, TRACEBACK_ATTR, None)
+  if text is None:
+    text = "".join(traceback.format_exception(type(exc), exc,
+                                              exc.__traceback__))
+  return text
+
+@contextmanager
+def _time_limit(seconds):
+  """
+  Raises a UnitTimeoutError in the main thread, if the block is not
+  completed within the given number of seconds (if None: no time limit).
+  """
+  if not seconds:
+    yield
+    return
+
+  def _on_timeout(signum, frame):
+    raise UnitTimeoutError(f"Time limit ({seconds} s) exceeded")
+  previous_handler = signal.signal(signal.SIGALRM, _on_timeout)
+  signal.setitimer(signal.ITIMER_REAL, seconds)
+  try:
+    yield
+  finally:
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.signal(signal.SIGALRM, previous_handler)
+
+def _run_chunk(plugin_compute, plugin_compute_batch, input_ids, params,
+               unit_timeout=None):
+  if plugin_compute_batch is not None:
+    try:
+      with _time_limit(unit_timeout and unit_timeout * len(input_ids)):
+        outputs = _run_compute_batch(plugin_compute_batch, input_ids, params)
+    except Exception as exc:
+      return [(None, _keep_traceback(exc))] * len(input_ids)
+    return [(output, None) for output in outputs]
+  outcomes = []
+  for input_id in input_ids:
+    try:
+      with _time_limit(unit_timeout):
+        outcomes.append((plugin_compute(input_id, **params), None))
+    except Exception as exc:
+      outcomes.append((None, _keep_traceback(exc)))
+  return outcomes
+
+_worker_entity_processor = None
+_worker_measures_rss = False
+_worker_start_times = None
+
+def _initialize_worker(measure_rss, start_times,
+                       *dumped_plugin_functions_and_params):
+  global _worker_entity_processor, _worker_measures_rss, _worker_start_times
+  _worker_measures_rss = measure_rss
+  _worker_start_times = start_times
+  _worker_entity_processor = \
+      EntityProcessor(*dumped_plugin_functions_and_params)
+
+def _initialize_fused_worker(measure_rss, start_times, dumped_load_input,
+                             shared_input, preloaded, unit_timeout,
+                             *entity_processors_args):
+  global _worker_entity_processor, _worker_measures_rss, _worker_start_times
+  _worker_measures_rss = measure_rss
+  _worker_start_times = start_times
+  processors = [EntityProcessor(*args) for args in entity_processors_args]
+  load_input = dill.loads(dumped_load_input) \
+      if dumped_load_input is not None else None
+  _worker_entity_processor = FusedEntityProcessor(
+      [processor.run_chunk for processor in processors],
+      shared_input, load_input, preloaded, unit_timeout)
+
+def _worker_rss():
+  """
+  Resident set size of the current process, in bytes (if not available,
+  the peak resident set size is returned).
+  """
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError, IndexError):
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+def _process_chunk(input_ids, slot=None):
+  """
+  Computes a chunk in a worker process. If ``slot`` is set, the time at
+  which the computation starts is written to the given slot of the
+  shared start times array (see ``BatchComputation._process_chunks``).
+  """
+  if slot is not None:
+    _worker_start_times[slot] = monotonic()
+  outcomes = _worker_entity_processor.run_chunk(input_ids)
+  return outcomes, (os.getpid(),
+                    _worker_rss() if _worker_measures_rss else None)
+
+def compute_units(plugin, input_ids, params, n_processes = 1):
+  """
+  Computes a list of input units using a plugin, in the current process
+  or, if ``n_processes`` is larger than 1, in a pool of worker processes
+  (e.g. for computing the units of a Slurm array task).
+
+  An exception raised by the plugin for an input unit does not stop
+  the computation of the other units.
+
+  Returns:
+    list: For each input ID, a tuple (output, exception), as in
+          ``EntityProcessor.run_chunk``.
+  """
+  if n_processes <= 1 or len(input_ids) <= 1:
+    return _run_chunk(plugin.compute, plugin.compute_batch, input_ids, params)
+  initargs = [False, None, dill.dumps(plugin.compute), dill.dumps(params),
+              None, None,
+              dill.dumps(plugin.compute_batch) \
+                  if plugin.compute_batch is not None else None]
+  chunk_size = -(-len(input_ids) // (4 * n_processes))
+  chunks = [input_ids[i:i+chunk_size] \
+              for i in range(0, len(input_ids), chunk_size)]
+  with ProcessPoolExecutor(n_processes, initializer=_initialize_worker,
+                           initargs=initargs) as executor:
+    return [outcome for outcomes, worker_status \
+              in executor.map(_process_chunk, chunks) \
+              for outcome in outcomes]
 
 class BatchComputation():
   """
@@ -55,7 +380,9 @@ class BatchComputation():
       desc (str): A shortened description of the plugin.
 
     Input/Output data:
-      all_ids (list): The input and output IDs for all input units.
+      all_ids (iterator): The input and output IDs for all input units;
+                          they are computed lazily, while the computation
+                          is running.
 
     Computation parameters/results:
       params (dict): The parameters to pass to the plugin compute.
@@ -66,15 +393,91 @@ class BatchComputation():
     Output control:
       verbose (bool): Whether to print verbose output.
 
+    Scheduling:
+      schedule (str): The order in which the input units are computed
+                      (one of SCHEDULES).
+
+    Parallel-specific attributes:
+      chunk_size (int): The number of input units passed to each worker call
+                        (or to each call of the plugin compute_batch function);
+                        if None, the default chunk size is used.
+      max_inflight (int): The maximal number of chunks submitted to the
+                          workers and not yet completed.
+      per_worker_init (bool): Whether the plugin initialize and finalize
+                              functions are run in each worker process.
+      unit_timeout (float): The time limit in seconds for the computation
+                            of a unit, or None.
+      max_tasks_per_worker (int): The number of worker calls after which
+                                  the worker processes are replaced, or None.
+      max_worker_rss (int): The resident memory size of a worker (in MiB)
+                            after which the worker processes are replaced,
+                            or None.
+
+    Threads-specific attributes:
+      n_threads (int): The number of worker threads.
+
+    Async-specific attributes:
+      concurrency (int): The maximal number of units computed concurrently.
+
     File handles:
       outfile (file): The file to write output to.
       logfile (file): The file to write log messages to.
+      writer (ResultsWriter): The writer of the results and log messages.
+      failuresfile (file): The file to write the failed units to,
+                           if continue_on_error is set.
+
+    Error handling:
+      continue_on_error (bool): Whether the computation continues after
+                                the computation of a unit failed.
+
+    Results cache:
+      cache (ResultsCache): The cache of the plugin outputs, or None.
+
+    Fused computations:
+      fused (list): The batch computations of further plugins, which
+                    are computed in the same pass over the input units.
+      load_input (function): The input loader function, whose output is
+                             passed to the plugins using a shared input,
+                             or None.
+      preload_input (bool): Whether, in the parallel mode, the inputs are
+                            loaded by the main process and passed to the
+                            workers in shared memory blocks.
+
+    Incremental recomputation:
+      fingerprints (InputFingerprints): The fingerprints of the inputs
+                                        of the units in the output file,
+                                        or None.
+
+    Skip list:
+      skipfilename (str): The path to the skip list file.
+      skip_index (SkipIndex): The index of the skip list file; it is updated
+                              with the output IDs written to the output file,
+                              if the output file is the skip list file.
 
     Slurm-specific attributes:
       slurmoutdir (str): The path to the SLURM output directory.
       slurmtmpdir (str): The path to the SLURM temporary directory.
+      slurm_units_per_task (int): The number of consecutive input units
+                                  computed by each array task.
+      slurm_task_processes (int): The number of processes used by each
+                                  array task.
+      slurm_max_resubmissions (int): The maximal number of resubmissions
+                                     of the failed tasks.
+      slurm_resubmission_options (list): The additional sbatch options
+                                         of each resubmission.
   """
 
+  MODES = ["parallel", "serial", "threads", "async", "slurm"]
+  SCHEDULES = ["input", "size", "cost"]
+  FUSED_PASS_MODES = ["serial", "parallel", "threads"]
+  DEFAULT_BATCH_SIZE = 64
+  DEFAULT_CONCURRENCY = 64
+  WATCHDOG_INTERVAL = 1.0
+  WATCHDOG_GRACE = 1.0
+  SLURM_FLUSH_INTERVAL = 5.0
+  SLURM_RESUBMIT_STATES = ["FAILED", "TIMEOUT", "PREEMPTED", "NODE_FAIL",
+                           "OUT_OF_MEMORY", "BOOT_FAIL"]
+
   def __init__(self, plugin, verbose=False):
     self.plugin = multiplug.importer(plugin, verbose=verbose,
                                      **plugins_helper.COMPUTE_PLUGIN_INTERFACE)
@@ -82,20 +485,51 @@ class BatchComputation():
     self.state = None
     self.outfile = sys.stdout
     self.logfile = sys.stderr
+    self.writer = ResultsWriter(self.outfile, self.logfile)
+    self.failuresfile = sys.stderr
+    self.continue_on_error = False
     self.all_ids = None
     self.report = None
     self.params = {}
+    self.initial_params = {}
     self.computed = False
+    self.schedule = "input"
+    self.cache = None
+    self._cache_keys = {}
+    self.outfilename = None
+    self.logfilename = None
+    self.fused = []
+    self.load_input = None
+    self.preload_input = False
+    self.fingerprints = None
+    self._input_fingerprints = {}
+    self._previous_sizes = {}
     self.slurmoutdir = None
     self.slurmtmpdir = None
+    self.slurm_units_per_task = 1
+    self.slurm_task_processes = 1
+    self.slurm_max_resubmissions = 0
+    self.slurm_resubmission_options = []
+    self.chunk_size = None
+    self.max_inflight = None
+    self.per_worker_init = False
+    self.unit_timeout = None
+    self.max_tasks_per_worker = None
+    self.max_worker_rss = None
+    self.n_threads = None
+    self.concurrency = None
+    self.skipfilename = None
+    self.skip_index = None
+    self.skip_index_tracks_output = False
 
   def _compute_skip_set(self, skip_arg, verbose):
-    skip = set()
+    skip = SkipIndex()
     if skip_arg and os.path.exists(skip_arg):
       if verbose:
         sys.stderr.write(f"# processing skip list... ({skip_arg})\n")
-      with open(skip_arg) as f:
-        for line in f: skip.add(line.rstrip().split("\t")[0])
+      skip = SkipIndex.from_file(skip_arg)
+      self.skipfilename = skip_arg
+      self.skip_index = skip
       if verbose:
         sys.stderr.write("# done: skipping computation for "+\
                          f"up to {len(skip)} units\n")
@@ -103,10 +537,10 @@ class BatchComputation():
       sys.stderr.write("# no skip list, all input units will be processed\n")
     return skip
 
-  def _get_mod_function(self, filename, fun, verbose):
+  def _get_mod_function(self, filename, fun, verbose,
+                        interface = plugins_helper.IDPROC_PLUGIN_INTERFACE):
     if filename:
-      pmod = multiplug.importer(filename, verbose=verbose,
-                                **plugins_helper.IDPROC_PLUGIN_INTERFACE)
+      pmod = multiplug.importer(filename, verbose=verbose, **interface)
       return getattr(pmod, fun)
     else:
       return None
@@ -115,34 +549,30 @@ class BatchComputation():
     identifier = idsproc(unit_name) if idsproc else unit_name
     return (unit_name if is_filename else identifier), identifier
 
+  @staticmethod
+  def _ids_from_file(f, idscol):
+    with f:
+      for line in f:
+        yield line.rstrip().split("\t")[idscol-1]
+
   def _input_units(self, globpattern, idsfile, idscol):
     if globpattern:
-      return glob(globpattern)
+      return iglob(globpattern)
     else:
-      with open(idsfile) as f:
-        return [line.rstrip().split("\t")[idscol-1] for line in f]
+      return self._ids_from_file(open(idsfile), idscol)
 
-  def _compute_all_ids(self, globpattern, idsfile, idscol,
-                       idsproc, skip, verbose):
-    if verbose:
-      sys.stderr.write("# compute input and output IDs...")
-    result = []
-    for unit_name in self._input_units(globpattern, idsfile, idscol):
-      input_id, output_id = self._compute_ids(unit_name, globpattern, idsproc)
-      if output_id in skip:
-        skip.remove(output_id)
-      else:
-        result.append((input_id, output_id))
-    if verbose:
-      sys.stderr.write("done\n")
-    return result
+  def _compute_all_ids(self, units, is_filename, idsproc, skip):
+    for unit_name in units:
+      input_id, output_id = self._compute_ids(unit_name, is_filename, idsproc)
+      if output_id not in skip:
+        yield (input_id, output_id)
 
   def _select_input(self, globpattern=None, idsfile=None, idscol=None,
             idsproc_module=None, skip=None, verbose=False):
     idsproc = self._get_mod_function(idsproc_module, "compute_id", verbose)
     skip = self._compute_skip_set(skip, verbose)
-    self.all_ids = self._compute_all_ids(globpattern, idsfile, idscol,
-                       idsproc, skip, verbose)
+    units = self._input_units(globpattern, idsfile, idscol)
+    self.all_ids = self._compute_all_ids(units, globpattern, idsproc, skip)
 
   def input_from_globpattern(self, globpattern, idsproc_module=None,
                              skip=None, verbose=False):
@@ -206,12 +636,296 @@ class BatchComputation():
       raise ValueError("idscol must be a positive integer")
     self._select_input(None, idsfilename, idscol, idsproc_module, skip, verbose)
 
-  def set_output(self, outfilename = None, logfilename = None):
-    self.outfile = open(outfilename, "a") if outfilename else sys.stdout
+  def set_output(self, outfilename = None, logfilename = None,
+                 buffer_size = None, fsync_interval = None, fsync_every = None,
+                 background_writer = False, results_format = "tsv",
+                 definitions = None):
+    """
+    Set the output files for the results and log messages.
+
+    If the filenames are not provided, the results are written to the
+    standard output and the log messages to the standard error. Existing
+    files are appended to.
+
+    The output is buffered and written in blocks of about ``buffer_size``
+    bytes (default: 64 kB). The files are synced to disk (fsync) every
+    ``fsync_interval`` seconds and/or every ``fsync_every`` units,
+    if these are set, and at the end of the computation.
+    If ``background_writer`` is set, the output is written by a
+    background thread, so that the computation does not wait for disk I/O.
+
+    By default, the results are written in tab-separated format.
+    Alternatively, a binary columnar format (``arrow``, i.e. Arrow IPC file,
+    or ``parquet``) can be selected using ``results_format``; this requires
+    the pyarrow package and an output file, which must not exist yet.
+    The columns are typed according to the datatypes of the attributes,
+    if the attribute definitions (``definitions``, as in the attribute
+    definitions YAML file) are provided; otherwise they are strings.
+    """
     self.logfile = open(logfilename, "a") if logfilename else sys.stderr
+    self.outfilename = outfilename
+    self.logfilename = logfilename
+    if results_format in COLUMNAR_FORMATS:
+      if not outfilename:
+        raise PrenacsError("An output file is required for "+\
+                           f"results in {results_format} format")
+      self.writer = ColumnarResultsWriter(outfilename, self.logfile,
+          results_columns(self.plugin.OUTPUT, definitions), results_format,
+          buffer_size, fsync_interval, fsync_every, background_writer)
+      self.outfile = self.writer.outfile
+    elif results_format == "tsv":
+      self.outfile = open(outfilename, "a") if outfilename else sys.stdout
+      self.writer = ResultsWriter(self.outfile, self.logfile, buffer_size,
+                                  fsync_interval, fsync_every,
+                                  background_writer)
+    else:
+      raise PrenacsError(f"Unknown results format: {results_format}")
+    self.skip_index_tracks_output = self.skip_index is not None and \
+        outfilename is not None and results_format == "tsv" and \
+        os.path.samefile(outfilename, self.skipfilename)
+
+  def set_failure_params(self, continue_on_error = False,
+                         failuresfilename = None):
+    """
+    Set how failures of the computation of single units are handled.
+
+    By default, the computation is stopped at the first failure,
+    and the report status is set to partial (or aborted).
+
+    If ``continue_on_error`` is set, the computation continues and each
+    failed unit is written to the failures file (``failuresfilename``,
+    default: standard error; an existing file is appended to).
+    This is a tab-separated file, with the columns: output ID, input ID,
+    exception class, exception message and traceback (in which tabs,
+    newlines and backslashes are escaped as ``\\t``, ``\\n``
+    and ``\\\\``). The number of failed units is stored in the report
+    remarks and the report status is set to partial.
+
+    The units whose computation exceeded the time limit (UnitTimeoutError)
+    or terminated the worker process (WorkerCrashError) are handled in
+    this way also if ``continue_on_error`` is not set, thus a plugin
+    hanging or crashing for some units does not stop the computation.
+    """
+    self.continue_on_error = continue_on_error
+    if failuresfilename:
+      self.failuresfile = open(failuresfilename, "a")
+
+  def set_cache(self, cachedir, max_size = None, fingerprint = "stat"):
+    """
+    Set a persistent cache of the plugin outputs.
+
+    Before computing a unit, the output is looked up in the cache directory
+    ``cachedir``; if found, it is output without running the computation,
+    otherwise the computed output is stored in the cache.
+    The outputs are cached by plugin ID and version, computation parameters
+    (including the initial ``state``) and input fingerprint
+    (see ``ResultsCache``; ``fingerprint`` can be ``stat`` or ``content``).
+    If ``max_size`` (in bytes) is set, the least recently used outputs
+    are removed, when the size of the cache exceeds it.
+    """
+    self.cache = ResultsCache(cachedir, max_size, fingerprint)
+
+  def set_fused(self, batch_computations):
+    """
+    Compute further plugins in the same pass over the input units.
+
+    Each of the ``batch_computations`` (BatchComputation instances) is the
+    computation of a further plugin, with its own output files (see
+    ``set_output``), computation parameters and report (see
+    ``setup_computation``) and failures handling (see
+    ``set_failure_params``); its input selection is not used.
+
+    For each chunk of input units, the plugins are computed one after the
+    other, in the same worker. The input selection, scheduling, results
+    cache, incremental computation and execution parameters of this
+    batch computation are used for all plugins; the computation modes
+    ``serial``, ``parallel`` and ``threads`` are supported.
+    """
+    self.fused = list(batch_computations)
+
+  def set_input_loader(self, input_loader_module, verbose = False,
+                       preload = False):
+    """
+    Set the input loader, used for sharing a parsed input between plugins.
+
+    The input loader is a Python/Nim/Rust module, providing a
+    ``load_input`` function, to which the input ID is passed, and which
+    returns a parsed input (e.g. the sequences of a Fasta file).
+    The input of each unit is loaded once and passed, instead of the
+    input ID, to the compute functions of the plugins which declare to use
+    a shared input by setting the ``SHARED_INPUT`` constant to True
+    (this plugin and the plugins of the fused computations, see
+    ``set_fused``).
+
+    By default, in the parallel mode, the inputs are loaded by the
+    worker processes. If ``preload`` is set, they are instead loaded by a
+    loader thread of the main process, ahead of the submission of the
+    chunks to the workers (up to ``max_inflight`` chunks ahead), and copied
+    once to shared memory blocks; the plugins get a read-only memoryview
+    of the block, which is mapped, not copied, by the worker processes.
+    In this case, ``load_input`` must return a bytes-like object (e.g. bytes
+    or a numpy array). Since the loader runs in a single thread of the
+    main process, this is useful if loading is fast compared to the
+    computation (e.g. decompressing or reading from a slow filesystem),
+    not for CPU-bound parsing, which is better done by the workers.
+    """
+    self.load_input = self._get_mod_function(input_loader_module,
+        "load_input", verbose, plugins_helper.INPUT_LOADER_PLUGIN_INTERFACE)
+    self.preload_input = preload
+
+  def _computations(self):
+    return [self] + self.fused
+
+  def _fused_pass(self):
+    return bool(self.fused) or self.load_input is not None
+
+  def _preloading(self):
+    return self.preload_input and self.load_input is not None and \
+        any(c.plugin.SHARED_INPUT for c in self._computations())
+
+  def _preload(self, input_id):
+    try:
+      return PreloadedInput(input_id, self.load_input(input_id))
+    except Exception as exc:
+      return PreloadedInput(input_id, error=_keep_traceback(exc))
+
+  def set_incremental(self):
+    """
+    Only compute the new units and those whose input file was modified
+    since they were computed to the output file.
+
+    The fingerprints of the inputs of the computed units (modification
+    time and size of the input files) are stored in a sidecar file,
+    named as the output file, with the ``.fingerprints`` suffix
+    (see ``InputFingerprints``). Units are computed, if their output ID
+    is not in the sidecar file, or the fingerprint of their input changed.
+    At the end of the computation, the previous lines of the recomputed
+    units are removed from the output file and log file (if any).
+
+    This requires a tab-separated output file, thus it must be called
+    after ``set_output``. The output file should not also be used as
+    skip list file, since this would skip the modified units.
+    """
+    if self.outfilename is None or \
+        isinstance(self.writer, ColumnarResultsWriter):
+      raise PrenacsError("Incremental computations require "+\
+                         "a tab-separated output file")
+    self.fingerprints = InputFingerprints(self.outfilename)
+    for filename in [self.outfilename, self.logfilename]:
+      if filename is not None:
+        self._previous_sizes[filename] = os.path.getsize(filename)
+
+  def set_schedule(self, schedule = "input"):
+    """
+    Set the order in which the input units are computed.
+
+    The following scheduling policies are available:
+    - ``input``: the units are computed in the order of the input
+      (default)
+    - ``size``: the units are computed by decreasing size of the input
+      file (if the input IDs are not filenames, they are computed in
+      the order of the input)
+    - ``cost``: the units are computed by decreasing computation cost,
+      as estimated by the ``estimate_cost`` function of the plugin,
+      to which the input ID and the computation parameters are passed
+
+    Computing the largest units first reduces the total computation time
+    in the parallel modes, if the size of the units is very variable.
+    Using the ``size`` and ``cost`` policies, the list of all the input units
+    is kept in memory, instead of being processed lazily.
+    """
+    if schedule not in self.SCHEDULES:
+      raise ValueError(f"Unknown schedule: {schedule}; "+\
+                       "it must be one of: " + ", ".join(self.SCHEDULES))
+    if schedule == "cost" and self.plugin.estimate_cost is None:
+      raise PrenacsError("The cost schedule requires a plugin "+\
+                         "providing an estimate_cost function")
+    self.schedule = schedule
+
+  @staticmethod
+  def _input_size(input_id):
+    try:
+      return os.path.getsize(input_id)
+    except (OSError, TypeError, ValueError):
+      return 0
+
+  def _uncached_units(self, units):
+    if self.cache is None:
+      return units
+    return self._lookup_cache(units)
+
+  def _lookup_cache(self, units):
+    digest = ResultsCache.computation_digest(self.plugin,
+                                             self.initial_params)
+    for unit_ids in units:
+      key = self.cache.key(digest, unit_ids[0])
+      output = self.cache.get(key)
+      if output is None:
+        self._cache_keys[unit_ids[1]] = key
+        yield unit_ids
+      else:
+        results, logs = output
+        self._on_success(unit_ids[1], results, logs)
+
+  def _modified_units(self, units):
+    computations = [c for c in self._computations() \
+                      if c.fingerprints is not None]
+    if not computations:
+      return units
+    return self._lookup_fingerprints(units, computations)
+
+  def _lookup_fingerprints(self, units, computations):
+    for unit_ids in units:
+      fingerprint = InputFingerprints.fingerprint(unit_ids[0])
+      if not all(c.fingerprints.is_current(unit_ids[1], fingerprint) \
+                   for c in computations):
+        for c in computations:
+          c._input_fingerprints[unit_ids[1]] = fingerprint
+        yield unit_ids
+
+  def _scheduled_units(self, units):
+    if self.schedule == "size":
+      def cost(unit_ids):
+        return self._input_size(unit_ids[0])
+    elif self.schedule == "cost":
+      def cost(unit_ids):
+        return self.plugin.estimate_cost(unit_ids[0], **self.params)
+    else:
+      return units
+    return iter(sorted(units, key=cost, reverse=True))
 
   def set_slurm_params(self, pluginfilename, submitterfilename,
-                      outdirname = None):
+                      outdirname = None, units_per_task = 1,
+                      task_processes = 1, max_resubmissions = 0,
+                      resubmission_options = None):
+    """
+    Set the parameters of the computation on a Slurm cluster.
+
+    The computation is submitted as a job array, using the sbatch script
+    ``submitterfilename`` (see ``prenacs/submit_array_job.sh``).
+    Each array task computes ``units_per_task`` consecutive input units
+    (default: 1), using ``task_processes`` processes (default: 1; if larger,
+    the number of CPUs per task is requested accordingly).
+    Packing multiple units in each task reduces the number of array tasks
+    (e.g. below the MaxArraySize of the cluster) and the cost of starting
+    a task (loading the plugin, parameters and input list) for each unit.
+
+    The tasks which fail with a state which can be transient
+    (see SLURM_RESUBMIT_STATES, e.g. TIMEOUT or PREEMPTED) are resubmitted
+    as a new job array, up to ``max_resubmissions`` times (default: 0).
+    The i-th resubmission uses the i-th list of additional sbatch options
+    of ``resubmission_options`` (e.g. ``[["--mem-per-cpu=4G"],
+    ["--mem-per-cpu=8G", "--time=04:00:00"]]``), or the last one,
+    if the list is shorter, so that the resources can be escalated.
+    """
+    if units_per_task < 1 or task_processes < 1 or max_resubmissions < 0:
+      raise ValueError("units_per_task and task_processes must be "+\
+                       "positive integers, max_resubmissions must be "+\
+                       "a non-negative integer")
+    self.slurm_max_resubmissions = max_resubmissions
+    self.slurm_resubmission_options = resubmission_options or []
+    self.slurm_units_per_task = units_per_task
+    self.slurm_task_processes = task_processes
     self.slurmsubmitter = Path(submitterfilename)
     self.slurmoutdir = Path(outdirname) \
         if outdirname else Path("prenacs_slurm_out")
@@ -220,6 +934,99 @@ class BatchComputation():
                                         dir=self.slurmoutdir)
     self.plugin_f = Path(pluginfilename)
 
+  def set_parallel_params(self, chunk_size = None, max_inflight = None,
+                          per_worker_init = False, unit_timeout = None,
+                          max_tasks_per_worker = None, max_worker_rss = None):
+    """
+    Set the parameters of the parallel computation mode.
+
+    The input units are batched into chunks of ``chunk_size`` units,
+    each of which is processed by a single worker call. The default is 1,
+    or DEFAULT_BATCH_SIZE, if the plugin provides a compute_batch function,
+    which is then called once for each chunk (also in the serial mode).
+    At most ``max_inflight`` chunks (default: 4 times the number of CPUs)
+    are submitted to the workers at once; further chunks are only
+    submitted when previous ones are completed, so that the memory
+    used for the bookkeeping does not depend on the number of input units.
+
+    If ``per_worker_init`` is set, the plugin initialize function is not run
+    in the main process, but once in each worker process, so that the state
+    does not need to be passed to the workers. The plugin finalize function
+    is then run in each worker process, with the state of that worker, when
+    the worker process exits. This must be set before calling
+    ``setup_computation``. In computation modes other than parallel, it
+    has no effect.
+
+    If ``unit_timeout`` is set, the computation of a unit is interrupted
+    after ``unit_timeout`` seconds of wall-clock time and fails with a
+    UnitTimeoutError. If a worker does not respond to the interruption
+    (e.g. while running native code), the worker processes are killed and
+    replaced. In general, if a worker process dies (e.g. because of a
+    segmentation fault), the worker processes are replaced, the units whose
+    computation was lost are computed again and the unit which caused the
+    crash fails with a WorkerCrashError. As for other failures of single
+    units, the computation then stops, unless ``continue_on_error`` is set
+    (see ``set_failure_params``).
+
+    In order to limit the effect of memory leaks in the plugin, the worker
+    processes can be replaced by new ones (recycled), when one of them
+    has processed ``max_tasks_per_worker`` chunks, or its resident memory
+    size exceeds ``max_worker_rss`` MiB. For this, no further chunks
+    are submitted, until the chunks already submitted are completed; then
+    the worker processes exit (running the plugin finalize function, if
+    ``per_worker_init`` is set) and new worker processes are started.
+    """
+    if chunk_size is not None:
+      if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+      self.chunk_size = chunk_size
+    if max_inflight is not None:
+      if max_inflight < 1:
+        raise ValueError("max_inflight must be a positive integer")
+      self.max_inflight = max_inflight
+    if per_worker_init:
+      if self.report:
+        raise ValueError("per_worker_init must be set before "+\
+                         "setting up the computation")
+      self.per_worker_init = True
+    if unit_timeout is not None:
+      if unit_timeout <= 0:
+        raise ValueError("unit_timeout must be a positive number")
+      self.unit_timeout = unit_timeout
+    if max_tasks_per_worker is not None:
+      if max_tasks_per_worker < 1:
+        raise ValueError("max_tasks_per_worker must be a positive integer")
+      self.max_tasks_per_worker = max_tasks_per_worker
+    if max_worker_rss is not None:
+      if max_worker_rss <= 0:
+        raise ValueError("max_worker_rss must be a positive number")
+      self.max_worker_rss = max_worker_rss
+
+  def set_threads_params(self, n_threads = None):
+    """
+    Set the parameters of the threads computation mode.
+
+    The computation is run using ``n_threads`` threads (default: as
+    determined by ``concurrent.futures.ThreadPoolExecutor``).
+    The chunking parameters are set using ``set_parallel_params``.
+    """
+    if n_threads is not None:
+      if n_threads < 1:
+        raise ValueError("n_threads must be a positive integer")
+      self.n_threads = n_threads
+
+  def set_async_params(self, concurrency = None):
+    """
+    Set the parameters of the async computation mode.
+
+    At most ``concurrency`` units (default: DEFAULT_CONCURRENCY) are
+    computed concurrently.
+    """
+    if concurrency is not None:
+      if concurrency < 1:
+        raise ValueError("concurrency must be a positive integer")
+      self.concurrency = concurrency
+
   def setup_computation(self, params = {}, reportfile = sys.stderr,
                         user = None, system = None, reason = None,
                         verbose = False):
@@ -272,32 +1079,51 @@ class BatchComputation():
       raise ValueError("Computation already set up")
     self.report = Report(reportfile, self.plugin,
                          user, system, reason, params)
-    self.params = params
+    self.params = dict(params)
+    self.initial_params = dict(params)
+    if not self.per_worker_init:
+      self._initialize_state()
+
+  def _initialize_state(self):
     if self.plugin.initialize is not None:
       self.params["state"] = \
           self.plugin.initialize(**self.params.get("state", {}))
 
   def _default_computation_setup(self):
     self.report = Report(sys.stderr, self.plugin)
-    if self.plugin.initialize is not None:
-      self.params["state"] = self.plugin.initialize()
-
-  def _on_failure(self, output_id, exc):
-    self.outfile.flush()
-    self.logfile.flush()
-    self.report.error(exc, output_id)
+    if not self.per_worker_init:
+      self._initialize_state()
+
+  @staticmethod
+  def _escape_tsv_field(value):
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").\
+        replace("\n", "\\n").replace("\r", "\\r")
+
+  def _on_failure(self, unit_ids, exc):
+    self._cache_keys.pop(unit_ids[1], None)
+    self._input_fingerprints.pop(unit_ids[1], None)
+    if not self.continue_on_error and \
+        not isinstance(exc, (UnitTimeoutError, WorkerCrashError)):
+      self.writer.flush()
+      self.report.error(exc, unit_ids[1])
+      raise exc
+    fields = [unit_ids[1], unit_ids[0], exc.__class__.__name__, str(exc),
+              _traceback_text(exc)]
+    self.failuresfile.write("\t".join([self._escape_tsv_field(f) \
+                                        for f in fields]) + "\n")
+    self.failuresfile.flush()
+    self.report.failure()
 
   def _on_success(self, output_id, results, logs):
-    results = "\t".join([str(r) for r in results])
-    if results:
-      self.outfile.write(f"{output_id}\t{results}\n")
-    for element in logs:
-      if isinstance(element, list):
-        for subelement in element:
-          if subelement:
-            self.logfile.write(f"{output_id}\t{subelement}\n")
-      elif element:
-        self.logfile.write(f"{output_id}\t{element}\n")
+    cache_key = self._cache_keys.pop(output_id, None)
+    if cache_key is not None:
+      self.cache.put(cache_key, (results, logs))
+    fingerprint = self._input_fingerprints.pop(output_id, None)
+    if fingerprint is not None:
+      self.fingerprints.record(output_id, fingerprint)
+    if self.writer.write(output_id, results, logs):
+      if self.skip_index_tracks_output:
+        self.skip_index.add(output_id)
     self.report.step()
 
   def run(self, mode="parallel", verbose=False):
@@ -309,185 +1135,754 @@ class BatchComputation():
 
     Other modes are:
     - serial: run the computation serially
+    - threads: run the computation in a pool of threads; this is suitable
+      for plugins which release the GIL (e.g. Nim or Rust plugins),
+      which shall declare it by setting the GIL_FREE constant to True;
+      the chunking parameters of the parallel mode also apply
+    - async: run the computation concurrently on an asyncio event loop;
+      if the plugin compute function is a coroutine function
+      (``async def``), it is awaited, otherwise it is run in a thread pool
+      (or, if the plugin provides a compute_batch function, this is run in
+      the thread pool for each chunk); this is suitable for I/O-bound plugins
     - slurm: run on a computer cluster managed by Slurm
     """
-    if not self.all_ids:
+    all_ids = iter(self.all_ids or [])
+    first_unit_ids = next(all_ids, None)
+    if first_unit_ids is None:
       if verbose:
         sys.stderr.write("# Warning: no computation, input list is empty\n")
-    if not self.report:
-      self._default_computation_setup()
+      self.all_ids = all_ids
+    else:
+      self.all_ids = chain([first_unit_ids], all_ids)
+    if self._fused_pass():
+      self._check_fused_pass(mode)
+    for computation in self._computations():
+      computation._prepare_run(mode)
+    self.all_ids = self._scheduled_units(
+        self._uncached_units(self._modified_units(self.all_ids)))
     if mode == "slurm":
       self._run_on_slurm_cluster(verbose)
-    elif "parallel":
+    elif mode == "parallel":
       self._run_in_parallel(verbose)
-    elif "serial":
+    elif mode == "serial":
       self._run_serially(verbose)
+    elif mode == "threads":
+      self._run_in_threads(verbose)
+    elif mode == "async":
+      self._run_asynchronously(verbose)
     else:
       raise RuntimeError(f"The computation mode '{mode}' is unknown\n"+\
-                        "It must be one of: parallel, serial, slurm.")
-    self.computed = True
+                        "It must be one of: " + ", ".join(self.MODES) + ".")
+    for computation in self._computations():
+      computation.computed = True
+
+  def _prepare_run(self, mode):
+    if not self.report:
+      self._default_computation_setup()
+    if self.per_worker_init and mode != "parallel":
+      self._initialize_state()
+      self.per_worker_init = False
+
+  def _check_fused_pass(self, mode):
+    if mode not in self.FUSED_PASS_MODES:
+      raise PrenacsError(f"The computation mode '{mode}' is not supported "+\
+          "for fused computations or using an input loader; it must "+\
+          "be one of: " + ", ".join(self.FUSED_PASS_MODES))
+    if self.fused and self.cache is not None:
+      raise PrenacsError("The results cache is not supported "+\
+                         "for fused computations")
+    for computation in self._computations():
+      if computation.plugin.SHARED_INPUT and self.load_input is None:
+        raise PrenacsError(f"The plugin {computation.plugin.ID} uses "+\
+            "a shared input (SHARED_INPUT), thus an input loader is required")
 
   def _run_on_slurm_cluster(self, verbose):
     if verbose:
       sys.stderr.write("# Computation will be on a SLURM cluster\n")
+    self.all_ids = list(self.all_ids)
     with tempfile.NamedTemporaryFile(delete=False, mode="wb",
                                      dir=self.slurmtmpdir) as params_f:
       dill.dump(self.params, params_f)
-    with tempfile.NamedTemporaryFile(delete=False, mode="wb",
-                                     dir=self.slurmtmpdir) as input_list_f:
-      dill.dump([i[0] for i in self.all_ids], input_list_f)
 
     # Remove the output and temporary folders
     def _remove_slurm_dirs():
       shutil.rmtree(self.slurmoutdir)
 
-    # Run the sbatch script with given parameters and get the job id
-    array_len = len(self.all_ids)
-    if array_len == 0:
+    if not self.all_ids:
       sys.stderr.write("# Job array is empty! Computation could not start! "+\
           "Have you already performed the computation for these units?\n")
       _remove_slurm_dirs()
       sys.exit(1)
-    else:
-      sys.stderr.write(f"# Number of tasks in the job array: {array_len}\n")
+
+    # Submit the job array; the tasks which failed for a reason which can
+    # be transient (see SLURM_RESUBMIT_STATES) are resubmitted as a new
+    # job array, as long as the resubmissions budget is not exhausted;
+    # if the collection is interrupted by an error, the job array
+    # is cancelled, before the output and temporary folders are removed
+    units = self.all_ids
+    running_job_id = None
+    try:
+      for attempt in range(self.slurm_max_resubmissions + 1):
+        outdir = Path(self.slurmoutdir)
+        if attempt > 0:
+          outdir = outdir/f"resubmission{attempt}"
+        job_id, array_len = self._submit_job_array(units, attempt,
+                                                   params_f.name, outdir)
+        running_job_id = job_id
+        failed, unit_failures = \
+            self._collect_job_array(job_id, array_len, units, outdir)
+        running_job_id = None
+        resubmitted = []
+        if attempt < self.slurm_max_resubmissions:
+          for status in self.SLURM_RESUBMIT_STATES:
+            resubmitted += failed.pop(status, [])
+        self._write_failed_tasks(job_id, array_len, units, failed,
+                                 unit_failures)
+        if not resubmitted:
+          break
+        units = [unit_ids for i in sorted(resubmitted) \
+                   for unit_ids in self._task_units(units, i)]
+        sys.stderr.write(f"# Resubmitting {len(resubmitted)} tasks "+\
+            f"({attempt+1} of {self.slurm_max_resubmissions} "+\
+            "resubmissions)\n")
+    except BaseException:
+      if running_job_id is not None:
+        sys.stderr.write(f"# Cancelling the Slurm job {running_job_id}\n")
+        try:
+          sh.scancel(str(running_job_id))
+        except Exception:
+          pass
+      raise
+    finally:
+      # Remove the output and temporary folder
+      _remove_slurm_dirs()
+
+  def _submit_job_array(self, units, attempt, params_filename, outdir):
+    """
+    Submits a job array for computing the given units.
+
+    Returns:
+      tuple: (job_id, number of tasks of the job array)
+    """
+    with tempfile.NamedTemporaryFile(delete=False, mode="wb",
+                                     dir=self.slurmtmpdir) as input_list_f:
+      IndexedInputList.write(input_list_f, [i[0] for i in units])
+    array_len = -(-len(units) // self.slurm_units_per_task)
+    sys.stderr.write(f"# Number of tasks in the job array: {array_len} "+\
+        f"(up to {self.slurm_units_per_task} units per task)\n")
+    sbatch_options = ["--parsable", "-a", f"0-{array_len-1}"]
+    if self.slurm_task_processes > 1:
+      sbatch_options += ["--cpus-per-task", str(self.slurm_task_processes)]
+    if attempt > 0 and self.slurm_resubmission_options:
+      sbatch_options += self.slurm_resubmission_options[
+          min(attempt, len(self.slurm_resubmission_options)) - 1]
     try:
-      sbatch_out = sh.sbatch("--parsable", "-a", f"0-{array_len-1}",
+      sbatch_out = sh.sbatch(*sbatch_options,
                               str(self.slurmsubmitter),
                               str(self.plugin_f),
-                              str(params_f.name),
+                              str(params_filename),
                               str(input_list_f.name),
-                              str(self.slurmoutdir),
+                              str(outdir),
+                              str(self.slurm_units_per_task),
+                              str(self.slurm_task_processes),
                               _piped="err")
       job_id = [int(i) for i in str(sbatch_out).split(";") \
           if i.strip().isdigit()][0]
     except sh.ErrorReturnCode:
-      _remove_slurm_dirs()
       raise ValueError("# Job submission is unsuccessful!\n")
-    except Exception as exc:
-      _remove_slurm_dirs()
-      raise exc
-    else:
-      sys.stderr.write("# Job submission is successful. "+\
-          f"Slurm job id: {job_id}\n")
-
-    def _get_stats(job_id):
-      stats_dict = {}
-      stats_out = str(sh.sacct("-n", "-X", "-j", f"{job_id}", "-o",
-                               "jobid,state%20")).split("\n")
-      for stat in stats_out:
-        s_pair = stat.split()
-        s_id, s_desc = None, None
-        if len(s_pair) == 2:
-          last_char = s_pair[0].split(f"{job_id}_")[-1]
-          if last_char.isdigit():
-            s_id = int(last_char)
-          s_desc = s_pair[1]
-          if s_desc and s_id is not None:
-            if s_desc not in stats_dict:
-              stats_dict[s_desc] = []
-            stats_dict[s_desc].append(s_id)
-      if stats_dict:
-        sys.stderr.write("------------------\n")
-        for status in stats_dict:
-          sys.stderr.write(f"# {status}: {len(stats_dict[status])}\n")
-        sys.stderr.write("------------------\n")
-      else:
-        sys.stderr.write("# Job status cannot be retrieved at the moment!")
-      return stats_dict
+    sys.stderr.write("# Job submission is successful. "+\
+        f"Slurm job id: {job_id}\n")
+    return job_id, array_len
+
+  def _collect_job_array(self, job_id, array_len, units, outdir):
+    """
+    Tracks the progress of the tasks of a job array from their completion
+    markers and collects the results of each task as soon as it is
+    completed; the output files of the tasks are removed, once their
+    results are flushed to the output file.
 
-    # Report the status of each job
-    n_completed = 0
+    Returns:
+      tuple: (failed, unit_failures), where failed contains the IDs of the
+             tasks which did not complete, by Slurm state, and unit_failures
+             the failed units (see ``_collect_task_output``).
+    """
+    monitor = SlurmArrayMonitor(job_id, array_len, outdir)
     progress_bar = tqdm.tqdm(total=array_len, ascii=True)
-    while int(sh.wc(sh.squeue("--jobs", f"{job_id}"), "-l")) > 1:
-      sleep(5)
-      stats_dict = _get_stats(job_id)
-      n_completed = len(stats_dict.get("COMPLETED", []))
-      progress_bar.n = n_completed
-      progress_bar.refresh()
-      sleep(10)
-
-    # Check if any of the tasks has been completed
-    # If so, collect the results into the output file
-    # If some tasks are failed, write the status of
-    # each uncompleted task into a tsv file
-    stats_dict = _get_stats(job_id)
-    n_completed = len(stats_dict.get("COMPLETED", []))
-    if progress_bar.n != n_completed:
-      progress_bar.n = n_completed
-      progress_bar.refresh()
+    collected = []
+    unit_failures = []
+    last_flush = monotonic()
+    for task_id in monitor.completed_tasks():
+      collected.append(self._collect_task_output(units, outdir, task_id,
+                                                 unit_failures))
+      progress_bar.update()
+      if monotonic() - last_flush >= self.SLURM_FLUSH_INTERVAL:
+        self._flush_collected(collected)
+        last_flush = monotonic()
+    self._flush_collected(collected)
     progress_bar.close()
-    if n_completed > 0:
-      if n_completed == array_len:
-        sys.stderr.write("# All tasks have been completed successfully!\n")
-      else:
-        err_f = f"failed_tasks_{job_id}.err"
-        with open(err_f, "a") as f:
-          for status in stats_dict:
-            if status != "COMPLETED":
-              for i in stats_dict[status]:
-                f.write(f"{self.all_ids[i][1]}\t{status}\t{i}\n")
-        sys.stderr.write(f"# {array_len-n_completed} tasks have "+\
-            "NOT been completed!\n")
-        sys.stderr.write(f"# You can find the details about the "+\
-            "uncompleted tasks in the file named {err_f}\n")
-      for out_f in glob(f"{self.slurmoutdir}/*"):
-        f_name = Path(out_f).stem
-        if f_name.isdigit():
-          f_id = int(f_name)
-          output_id = self.all_ids[f_id][1]
-          with open(out_f, "rb") as f:
-            results, *logs = dill.load(f)
-            self._on_success(output_id, results, logs)
-    else:
+    n_completed = len(monitor.completed)
+    if n_completed == array_len:
+      sys.stderr.write("# All tasks have been completed successfully!\n")
+      return {}, unit_failures
+    if n_completed == 0:
       sys.stderr.write("# All tasks have failed!\n")
+    failed = monitor.failed_tasks()
+    sys.stderr.write("------------------\n")
+    for status in failed:
+      sys.stderr.write(f"# {status}: {len(failed[status])}\n")
+    sys.stderr.write("------------------\n")
+    return failed, unit_failures
+
+  def _write_failed_tasks(self, job_id, array_len, units, failed,
+                          unit_failures):
+    """
+    Writes the units of the tasks which did not complete (and are not
+    resubmitted) and the failed units of the completed tasks to a
+    tab-separated file, with their Slurm state (FAILED for the failed
+    units) and task ID. Each of these units is counted as failed in the
+    report, thus the computation status is then partial.
+    """
+    n_failed = sum(len(task_ids) for task_ids in failed.values())
+    if not failed and not unit_failures:
+      return
+    err_f = f"failed_tasks_{job_id}.err"
+    with open(err_f, "a") as f:
+      for status in failed:
+        for i in failed[status]:
+          for unit_ids in self._task_units(units, i):
+            f.write(f"{unit_ids[1]}\t{status}\t{i}\n")
+            self.report.failure()
+      for unit_ids, i in unit_failures:
+        f.write(f"{unit_ids[1]}\tFAILED\t{i}\n")
+        self.report.failure()
+    if failed:
+      sys.stderr.write(f"# {n_failed} of {array_len} tasks have "+\
+          "NOT been completed!\n")
+    if unit_failures:
+      sys.stderr.write(f"# The computation of {len(unit_failures)} "+\
+          "units has failed!\n")
+    sys.stderr.write("# You can find the details about the "+\
+        f"uncompleted tasks in the file named {err_f}\n")
+
+  def _task_units(self, units, task_id):
+    start = task_id * self.slurm_units_per_task
+    return units[start:start + self.slurm_units_per_task]
+
+  def _collect_task_output(self, units, outdir, task_id, unit_failures):
+    """
+    Processes the outcomes of the units of a completed task.
 
-    # Remove the output and temporary folder
-    _remove_slurm_dirs()
+    Unless ``continue_on_error`` is set, the units for which the plugin
+    raised an exception do not stop the computation (as the other tasks
+    of the job array are still running), but are appended, with the
+    task ID, to ``unit_failures``, to be written to the failed tasks file.
+
+    Returns:
+      Path: The output file of the task.
+    """
+    filename = Path(outdir)/str(task_id)
+    with open(filename, "rb") as f:
+      outcomes = dill.load(f)
+    for unit_ids, (output, exc) in zip(self._task_units(units, task_id),
+                                       outcomes):
+      if exc is not None and not self.continue_on_error:
+        unit_failures.append((unit_ids, task_id))
+      else:
+        self._process_outcome(unit_ids, output, exc)
+    return filename
+
+  def _flush_collected(self, filenames):
+    self.writer.flush()
+    for filename in filenames:
+      os.unlink(filename)
+    filenames.clear()
+
+  def _chunk_size(self):
+    if self.chunk_size is not None:
+      return self.chunk_size
+    return self.DEFAULT_BATCH_SIZE \
+        if self.plugin.compute_batch is not None else 1
+
+  def _chunks(self, units):
+    chunk_size = self._chunk_size()
+    chunk = []
+    for unit_ids in units:
+      chunk.append(unit_ids)
+      if len(chunk) == chunk_size:
+        yield chunk
+        chunk = []
+    if chunk:
+      yield chunk
+
+  def _entity_processor_args(self, unit_timeout):
+    args = [dill.dumps(self.plugin.compute), dill.dumps(self.params)]
+    worker_functions = [self.plugin.initialize, self.plugin.finalize] \
+        if self.per_worker_init else [None, None]
+    worker_functions.append(self.plugin.compute_batch)
+    args += [dill.dumps(f) if f is not None else None
+             for f in worker_functions]
+    args.append(unit_timeout)
+    return args
+
+  def _fused_processor(self, unit_timeout=None):
+    return FusedEntityProcessor(
+        [partial(_run_chunk, c.plugin.compute, c.plugin.compute_batch,
+                 params=c.params, unit_timeout=unit_timeout) \
+           for c in self._computations()],
+        [bool(c.plugin.SHARED_INPUT) for c in self._computations()],
+        self.load_input, unit_timeout=unit_timeout)
+
+  def _max_inflight(self):
+    return self.max_inflight or 4 * (os.cpu_count() or 1)
 
   def _run_in_parallel(self, verbose):
-      entity_processor = EntityProcessor(dill.dumps(self.plugin.compute))
       if verbose:
         sys.stderr.write("# Computation will be in parallel (multiprocess)\n")
-      with ProcessPoolExecutor() as executor:
-        futures_map = {executor.submit(entity_processor.run,
-                                       unit_ids[0], self.params):
-                       unit_ids[1] for unit_ids in self.all_ids}
-        for future in tqdm.tqdm(as_completed(futures_map),
-                                total=len(futures_map), desc=self.desc):
-          output_id = futures_map[future]
+      # the workers only measure their resident memory size, if it is
+      # used for recycling them
+      measure_rss = self.max_worker_rss is not None
+      # the workers write the start time of the chunks to a shared array,
+      # for detecting hung workers (one slot for each chunk in flight)
+      start_times = multiprocessing.RawArray("d", self._max_inflight()) \
+          if self.unit_timeout is not None else None
+      if self._fused_pass():
+        initializer = _initialize_fused_worker
+        initargs = [measure_rss, start_times, dill.dumps(self.load_input) \
+                      if self.load_input is not None else None,
+                    [bool(c.plugin.SHARED_INPUT) \
+                      for c in self._computations()],
+                    self._preloading(), self.unit_timeout]
+        initargs += [c._entity_processor_args(self.unit_timeout) \
+                      for c in self._computations()]
+      else:
+        initializer = _initialize_worker
+        initargs = [measure_rss, start_times] + \
+            self._entity_processor_args(self.unit_timeout)
+
+      def _new_executor():
+        return ProcessPoolExecutor(initializer=initializer,
+                                   initargs=initargs)
+      self._process_chunks(_new_executor, _process_chunk,
+                           replace_workers=True, preload=self._preloading(),
+                           start_times=start_times)
+
+  def _run_in_threads(self, verbose):
+    if verbose:
+      sys.stderr.write("# Computation will be in parallel (threads)\n")
+    if not self.plugin.GIL_FREE:
+      sys.stderr.write("# Warning: the plugin does not declare to be "+\
+          "GIL-free (GIL_FREE constant), thus the threads mode could "+\
+          "be slower than the parallel mode\n")
+    if self._fused_pass():
+      # no time limit: the SIGALRM handler can only be set in the main thread
+      processor = self._fused_processor()
+
+      def _process_chunk_in_thread(input_ids):
+        return processor.run_chunk(input_ids), None
+    else:
+      def _process_chunk_in_thread(input_ids):
+        return _run_chunk(self.plugin.compute, self.plugin.compute_batch,
+                          input_ids, self.params), None
+    self._process_chunks(
+        lambda: ThreadPoolExecutor(max_workers=self.n_threads),
+        _process_chunk_in_thread)
+
+  def _process_outcome(self, unit_ids, output, exc):
+    try:
+      if exc is not None:
+        raise exc
+      results, *logs = output
+    except Exception as exc:
+      self._on_failure(unit_ids, exc)
+    else:
+      self._on_success(unit_ids[1], results, logs)
+
+  def _process_outcomes(self, chunk, outcomes, progress_bar):
+    """
+    Processes the outcomes of the units of a chunk. In a fused pass,
+    the outcome of a unit is the list of the outcomes of the plugins
+    (or a single outcome, e.g. an error of the worker, which applies to
+    all plugins).
+    """
+    computations = self._computations()
+    for unit_ids, outcome in zip(chunk, outcomes):
+      if not isinstance(outcome, list):
+        outcome = [outcome] * len(computations)
+      for computation, (output, exc) in zip(computations, outcome):
+        computation._process_outcome(unit_ids, output, exc)
+      progress_bar.update()
+
+  @staticmethod
+  def _kill_workers(executor):
+    # ProcessPoolExecutor does not provide a public method
+    # for terminating the worker processes
+    for process in list(getattr(executor, "_processes", {}).values()):
+      process.kill()
+
+  def _process_chunks(self, new_executor, process_chunk,
+                      replace_workers=False, preload=False,
+                      start_times=None):
+    """
+    Computes the chunks of input units using the executor created by
+    ``new_executor``, submitting at most ``max_inflight`` chunks at once.
+
+    If ``replace_workers`` is set, the executor is replaced, when the
+    worker processes die (BrokenProcessPool) or, if ``unit_timeout`` is set,
+    when the computation of a chunk is not completed in time (hung workers).
+    The units whose computation was lost, while not being responsible
+    for the failure, are computed again; if the responsible unit is not
+    known, the units are then computed one at a time (in isolation),
+    until the responsible unit is found.
+
+    The ``process_chunk`` function returns the outcomes for the units
+    of the chunk and the PID and resident memory size of the worker
+    (or None; the size is None, unless ``max_worker_rss`` is set);
+    if ``replace_workers`` is set, these are used for recycling the
+    workers (see ``max_tasks_per_worker`` and ``max_worker_rss``).
+
+    If ``preload`` is set, the inputs of the chunks are loaded by a
+    loader thread, up to ``max_inflight`` chunks ahead of the submitted
+    ones, and passed to ``process_chunk`` as PreloadedInput instances,
+    whose shared memory blocks are removed when the chunk is completed
+    or lost (the inputs of chunks computed again are loaded again, when
+    the chunk is resubmitted).
+
+    If ``start_times`` (a shared array with ``max_inflight`` elements) is
+    set, each chunk is assigned a free slot of the array, which is passed
+    to ``process_chunk``; the worker writes there the time at which it
+    starts computing the chunk (``time.monotonic``, which is system-wide),
+    so that the time limit of hung workers is measured from the actual
+    start of the computation, including the input loading.
+    """
+    max_inflight = self._max_inflight()
+    watchdog = replace_workers and start_times is not None
+    chunks = self._chunks(self.all_ids)
+    progress_bar = tqdm.tqdm(desc=self.desc)
+    executor = new_executor()
+    inflight = {}      # future => chunk
+    preloaded = {}     # future => preloaded inputs of the chunk
+    slots = {}         # future => slot of its start time
+    free_slots = list(range(max_inflight)) if watchdog else []
+    isolated = set()   # futures of units computed in isolation
+    retry = deque()    # chunks to compute again
+    suspects = deque()  # units to compute in isolation
+    worker_tasks = {}  # PID => number of completed worker calls
+    # time limit for each unit: computation by each plugin and loading
+    unit_deadline = (len(self._computations()) + \
+        (self.load_input is not None and not preload)) * \
+        (self.unit_timeout or 0)
+    recycling = False  # whether the workers are being recycled
+    loader = ThreadPoolExecutor(max_workers=1) if preload else None
+    loading = deque()  # (chunk, future of its preloaded inputs)
+
+    def _load(chunk):
+      return [self._preload(unit_ids[0]) for unit_ids in chunk]
+
+    def _prefetch(n):
+      while len(loading) < n:
+        chunk = next(chunks, None)
+        if chunk is None:
+          return
+        loading.append((chunk, loader.submit(_load, chunk)))
+
+    def _submit(chunk, in_isolation=False, loaded=None):
+      inputs = [unit_ids[0] for unit_ids in chunk]
+      if preload:
+        inputs = loaded.result() if loaded is not None else _load(chunk)
+      args = [inputs]
+      if watchdog:
+        slot = free_slots.pop()
+        start_times[slot] = 0
+        args.append(slot)
+      try:
+        future = executor.submit(process_chunk, *args)
+      except BrokenProcessPool as exc:
+        future = Future()
+        future.set_exception(exc)
+      if watchdog:
+        slots[future] = slot
+      inflight[future] = chunk
+      if preload:
+        preloaded[future] = inputs
+      if in_isolation:
+        isolated.add(future)
+
+    def _release(future):
+      if future in slots:
+        free_slots.append(slots.pop(future))
+      for unit in preloaded.pop(future, []):
+        unit.release()
+
+    def _next_chunks(n):
+      while retry and n > 0:
+        n -= 1
+        yield retry.popleft(), None
+      if not preload:
+        yield from ((chunk, None) for chunk in islice(chunks, n))
+        return
+      _prefetch(n)
+      while loading and n > 0:
+        n -= 1
+        yield loading.popleft()
+      _prefetch(max_inflight)
+
+    def _submit_chunks():
+      if recycling:
+        return
+      if suspects:
+        if not inflight:
+          _submit([suspects.popleft()], in_isolation=True)
+      else:
+        for chunk, loaded in _next_chunks(max_inflight - len(inflight)):
+          _submit(chunk, loaded=loaded)
+
+    def _hung_futures():
+      now = monotonic()
+      hung = set()
+      for future, chunk in inflight.items():
+        started = start_times[slots[future]]
+        if started and now - started > self.WATCHDOG_GRACE + \
+            2 * len(chunk) * unit_deadline:
+          hung.add(future)
+      return hung
+
+    def _recycling_due(worker_status):
+      if worker_status is None:
+        return False
+      pid, rss = worker_status
+      worker_tasks[pid] = worker_tasks.get(pid, 0) + 1
+      if self.max_tasks_per_worker is not None and \
+          worker_tasks[pid] >= self.max_tasks_per_worker:
+        return True
+      if self.max_worker_rss is not None and \
+          rss > self.max_worker_rss * (1 << 20):
+        return True
+      return False
+
+    def _cancel_pending():
+      # shutdown(cancel_futures=True) requires Python 3.9
+      for future in inflight:
+        future.cancel()
+
+    def _replace_executor(lost, hung):
+      nonlocal executor
+      if hung:
+        self._kill_workers(executor)
+      _cancel_pending()
+      executor.shutdown(wait=False)
+      executor = new_executor()
+      worker_tasks.clear()
+      lost += list(inflight.items())
+      inflight.clear()
+      for future, chunk in lost:
+        _release(future)
+      for future, chunk in lost:
+        if future in hung:
+          if len(chunk) == 1:
+            self._process_outcomes(chunk, [(None, UnitTimeoutError(\
+                f"Time limit ({self.unit_timeout} s) exceeded, "+\
+                "the worker process was killed"))], progress_bar)
+          else:
+            suspects.extend(chunk)
+        elif hung:
+          retry.append(chunk)
+        elif future in isolated:
+          self._process_outcomes(chunk, [(None, WorkerCrashError(\
+              "The worker process terminated abruptly"))], progress_bar)
+        else:
+          suspects.extend(chunk)
+      isolated.clear()
+
+    try:
+      _submit_chunks()
+      while inflight:
+        done, _ = wait(inflight,
+                       timeout=self.WATCHDOG_INTERVAL if watchdog else None,
+                       return_when=FIRST_COMPLETED)
+        lost = []
+        for future in done:
+          chunk = inflight.pop(future)
+          _release(future)
           try:
-            results, *logs = future.result()
+            outcomes, worker_status = future.result()
+          except BrokenProcessPool:
+            lost.append((future, chunk))
+            continue
           except Exception as exc:
-            self._on_failure(output_id, exc)
-            raise(exc)
-          else:
-            self._on_success(output_id, results, logs)
+            outcomes, worker_status = [(None, exc)] * len(chunk), None
+          if replace_workers and _recycling_due(worker_status):
+            recycling = True
+          self._process_outcomes(chunk, outcomes, progress_bar)
+        hung = _hung_futures() if watchdog else set()
+        if replace_workers and (lost or hung):
+          _replace_executor(lost, hung)
+          recycling = False
+        elif lost:
+          raise lost[0][0].exception()
+        if recycling and not inflight:
+          executor.shutdown(wait=True)
+          executor = new_executor()
+          worker_tasks.clear()
+          recycling = False
+        _submit_chunks()
+    except BaseException:
+      if watchdog:
+        # otherwise the shutdown waits for the hung workers, if any
+        self._kill_workers(executor)
+      raise
+    finally:
+      _cancel_pending()
+      executor.shutdown(wait=True)
+      for future in list(preloaded):
+        _release(future)
+      if loader is not None:
+        loader.shutdown(wait=True)
+        for chunk, loaded in loading:
+          if loaded.exception() is None:
+            for unit in loaded.result():
+              unit.release()
+      progress_bar.close()
 
   def _run_serially(self, verbose):
       if verbose:
         sys.stderr.write("# Computation will be serial\n")
+      if self._fused_pass():
+        self._run_fused_serially()
+        return
+      if self.plugin.compute_batch is not None:
+        self._run_serially_batched()
+        return
       for unit_ids in tqdm.tqdm(self.all_ids, desc=self.desc):
         output_id = unit_ids[1]
         try:
           results, *logs = self.plugin.compute(unit_ids[0], **self.params)
         except Exception as exc:
-          self._on_failure(output_id, exc)
-          raise(exc)
+          self._on_failure(unit_ids, exc)
+        else:
+          self._on_success(output_id, results, logs)
+
+  def _run_serially_batched(self):
+    progress_bar = tqdm.tqdm(desc=self.desc)
+    for chunk in self._chunks(self.all_ids):
+      try:
+        outputs = _run_compute_batch(self.plugin.compute_batch,
+                                     [unit_ids[0] for unit_ids in chunk],
+                                     self.params)
+      except Exception as exc:
+        outputs = [exc] * len(chunk)
+      for unit_ids, output in zip(chunk, outputs):
+        output_id = unit_ids[1]
+        try:
+          if isinstance(output, Exception):
+            raise output
+          results, *logs = output
+        except Exception as exc:
+          self._on_failure(unit_ids, exc)
         else:
           self._on_success(output_id, results, logs)
+        progress_bar.update()
+    progress_bar.close()
+
+  def _run_fused_serially(self):
+    processor = self._fused_processor(self.unit_timeout)
+    progress_bar = tqdm.tqdm(desc=self.desc)
+    for chunk in self._chunks(self.all_ids):
+      outcomes = processor.run_chunk([unit_ids[0] for unit_ids in chunk])
+      self._process_outcomes(chunk, outcomes, progress_bar)
+    progress_bar.close()
+
+  def _run_asynchronously(self, verbose):
+    if verbose:
+      sys.stderr.write("# Computation will be asynchronous (asyncio)\n")
+    asyncio.run(self._compute_asynchronously())
+
+  async def _compute_unit_async(self, input_id):
+    if inspect.iscoroutinefunction(self.plugin.compute):
+      return await self.plugin.compute(input_id, **self.params)
+    else:
+      loop = asyncio.get_running_loop()
+      return await loop.run_in_executor(None,
+          partial(self.plugin.compute, input_id, **self.params))
+
+  async def _compute_chunk_async(self, chunk):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None,
+        partial(_run_chunk, None, self.plugin.compute_batch,
+                [unit_ids[0] for unit_ids in chunk], self.params))
+
+  async def _compute_asynchronously(self):
+    """
+    Computes the units, at most ``concurrency`` at once. If the plugin
+    provides a compute_batch function and its compute function is not
+    a coroutine function, the chunks of units are computed instead,
+    at most ``concurrency`` at once.
+    """
+    concurrency = self.concurrency or self.DEFAULT_CONCURRENCY
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency))
+    batched = self.plugin.compute_batch is not None and \
+        not inspect.iscoroutinefunction(self.plugin.compute)
+    units = self._chunks(self.all_ids) if batched else iter(self.all_ids)
+    progress_bar = tqdm.tqdm(desc=self.desc)
+    inflight = {}
+
+    def _start_tasks():
+      for unit_ids in islice(units, concurrency - len(inflight)):
+        task = asyncio.ensure_future(\
+            self._compute_chunk_async(unit_ids) if batched else \
+            self._compute_unit_async(unit_ids[0]))
+        inflight[task] = unit_ids
+    try:
+      _start_tasks()
+      while inflight:
+        done, _ = await asyncio.wait(inflight,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          unit_ids = inflight.pop(task)
+          if batched:
+            # here unit_ids is a chunk; the errors are in the outcomes
+            self._process_outcomes(unit_ids, task.result(), progress_bar)
+            continue
+          output_id = unit_ids[1]
+          try:
+            results, *logs = task.result()
+          except Exception as exc:
+            self._on_failure(unit_ids, exc)
+          else:
+            self._on_success(output_id, results, logs)
+          progress_bar.update()
+        _start_tasks()
+    finally:
+      for task in inflight:
+        task.cancel()
+      progress_bar.close()
 
   def finalize(self):
     """
     This method is called after the computation is finished.
 
     It finalizes the report, runs the plugin finalization code
-    (if any) and closes the output files.
+    (if any, and unless it was run in each worker process)
+    and closes the output files; in incremental computations, it also
+    removes the superseded lines from the output files and saves the
+    input fingerprints. The fused computations (if any) are also finalized.
     """
     if not self.computed:
       raise ValueError("Computation not run")
     self.report.finalize()
-    if self.plugin.finalize is not None:
+    if self.plugin.finalize is not None and not self.per_worker_init:
       self.plugin.finalize(self.params.get("state", None))
-    if self.outfile != sys.stdout: self.outfile.close()
-    if self.logfile != sys.stderr: self.logfile.close()
+    if self.skip_index_tracks_output:
+      self.writer.flush()
+      self.skip_index.save(self.skipfilename,
+                           os.path.getsize(self.skipfilename))
+    self.writer.close()
+    if self.fingerprints is not None:
+      for filename, previous_size in self._previous_sizes.items():
+        self.fingerprints.supersede_rows(filename, previous_size)
+      self.fingerprints.save()
+    if self.failuresfile not in [sys.stdout, sys.stderr]:
+      self.failuresfile.close()
+    for computation in self.fused:
+      computation.finalize()
 
@@ -0,0 +1,217 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+"""
+Binary columnar formats (Arrow IPC file, Parquet) for computation results.
+
+The pyarrow package is an optional dependency, which is only necessary
+if a binary columnar format is used.
+"""
+
+import os
+from prenacs.error import PrenacsError
+from prenacs.results_writer import ResultsWriter
+
+RESULTS_FORMATS = ["tsv", "arrow", "parquet"]
+COLUMNAR_FORMATS = ["arrow", "parquet"]
+
+ENTITY_ID_COLUMN = "entity_id"
+
+FORMAT_MAGIC = {"arrow": b"ARROW1", "parquet": b"PAR1"}
+
+INTEGER_DATATYPES = ["Integer", "SmallInteger", "BigInteger"]
+FLOAT_DATATYPES = ["Float", "Numeric", "REAL", "DECIMAL", "Double"]
+BOOLEAN_DATATYPES = ["Boolean"]
+
+def import_pyarrow():
+  """
+  Imports the pyarrow package, raising a PrenacsError if it is not installed.
+  """
+  try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+  except ImportError:
+    raise PrenacsError("The pyarrow package is required for the binary "+\
+        "results formats ("+", ".join(COLUMNAR_FORMATS)+"); "+\
+        "it can be installed using: pip install pyarrow")
+  return pyarrow
+
+def results_format_of(filename):
+  """
+  Determines the format of a results file from its first bytes.
+
+  Returns:
+    str: One of the values of RESULTS_FORMATS.
+  """
+  with open(filename, "rb") as f:
+    head = f.read(max(len(m) for m in FORMAT_MAGIC.values()))
+  for fmt, magic in FORMAT_MAGIC.items():
+    if head.startswith(magic):
+      return fmt
+  return "tsv"
+
+def _datatype_elements(datatype):
+  for elem in datatype.split(";"):
+    n = 1
+    if elem.endswith("]"):
+      elem, n = elem[:-1].split("[")
+      n = int(n)
+    yield elem.split("(")[0].strip(), n
+
+def _value_type(datatype_name):
+  if datatype_name in INTEGER_DATATYPES:
+    return "int64"
+  elif datatype_name in FLOAT_DATATYPES:
+    return "float64"
+  elif datatype_name in BOOLEAN_DATATYPES:
+    return "bool"
+  else:
+    return "string"
+
+def results_columns(output, definitions = None):
+  """
+  Computes the names and value types of the results columns.
+
+  Args:
+    output (list): The names of the attributes computed by the plugin
+                   (OUTPUT constant of the plugin).
+    definitions (dict): The attribute definitions (as in the attribute
+      definitions YAML file); the datatypes of the attributes are used
+      for selecting the value types of the columns; attributes consisting of
+      multiple values are stored in multiple columns, named as the attribute,
+      followed by the 0-based index of the value.
+      If not provided, each attribute is stored as a single string column.
+
+  Returns:
+    list: Tuples (column name, value type), where the value type is
+          one of: int64, float64, bool, string.
+  """
+  columns = []
+  for name in output:
+    if definitions is None:
+      columns.append((name, "string"))
+      continue
+    if name not in definitions:
+      raise PrenacsError(f"Attribute '{name}' not found in the "+\
+                         "attribute definitions")
+    value_types = []
+    for datatype_name, n in _datatype_elements(definitions[name]["datatype"]):
+      value_types += [_value_type(datatype_name)] * n
+    if len(value_types) == 1:
+      columns.append((name, value_types[0]))
+    else:
+      columns += [(f"{name}{i}", t) for i, t in enumerate(value_types)]
+  return columns
+
+def _to_bool(value):
+  if isinstance(value, str):
+    return value.lower() in ["1", "true", "t", "yes", "y"]
+  return bool(value)
+
+VALUE_CONVERTERS = {"int64": int, "float64": float, "bool": _to_bool,
+                    "string": str}
+
+class ColumnarResultsWriter(ResultsWriter):
+  """
+  Writes the computation results to a binary columnar file
+  (Arrow IPC file or Parquet), and the logs to a text file.
+
+  The results are typed according to the attribute datatypes
+  (see ``results_columns``). The first column (``entity_id``) contains
+  the output IDs. The buffered results are written as record batches
+  (Arrow) or row groups (Parquet).
+
+  Columnar files cannot be appended to, thus the output file must not
+  exist or be empty.
+  """
+
+  DEFAULT_BUFFER_SIZE = 1 << 20
+  VALUE_SIZE_ESTIMATE = 16
+
+  def __init__(self, outfilename, logfile, columns, results_format,
+               buffer_size = None, fsync_interval = None, fsync_every = None,
+               background = False):
+    pa = import_pyarrow()
+    if results_format not in COLUMNAR_FORMATS:
+      raise PrenacsError(f"Unknown columnar format: {results_format}")
+    if os.path.exists(outfilename) and os.path.getsize(outfilename) > 0:
+      raise PrenacsError(f"Results file {outfilename} already exists; "+\
+          f"results in {results_format} format cannot be appended "+\
+          "to an existing file")
+    self.pa = pa
+    self.columns = columns
+    self.schema = pa.schema([(ENTITY_ID_COLUMN, pa.string())] + \
+        [(name, pa.type_for_alias(value_type)) \
+            for name, value_type in columns])
+    self.converters = [VALUE_CONVERTERS[value_type] \
+                         for name, value_type in columns]
+    self.results_format = results_format
+    sink = open(outfilename, "wb")
+    if results_format == "arrow":
+      self.results_writer = pa.ipc.new_file(sink, self.schema)
+    else:
+      self.results_writer = pa.parquet.ParquetWriter(sink, self.schema)
+    super().__init__(sink, logfile, buffer_size, fsync_interval,
+                     fsync_every, background)
+
+  def _add_results(self, output_id, results):
+    if isinstance(results, str):
+      results = results.split("\t") if results else []
+    if not results:
+      return False
+    if len(results) != len(self.columns):
+      raise PrenacsError(f"Unit {output_id}: {len(results)} values "+\
+          f"computed, but {len(self.columns)} results columns expected")
+    self._out_lines.append((output_id, results))
+    self._buffered += self.VALUE_SIZE_ESTIMATE * (len(results) + 1)
+    return True
+
+  def _convert_column(self, values, converter):
+    return [None if v is None or v == "" else converter(v) for v in values]
+
+  def _write_results(self, rows):
+    output_ids = [row[0] for row in rows]
+    columns = list(zip(*[row[1] for row in rows]))
+    arrays = [self.pa.array(output_ids, self.pa.string())]
+    for values, converter, field in zip(columns, self.converters,
+                                        list(self.schema)[1:]):
+      arrays.append(self.pa.array(self._convert_column(values, converter),
+                                  field.type))
+    batch = self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+    if self.results_format == "arrow":
+      self.results_writer.write_batch(batch)
+    else:
+      self.results_writer.write_table(self.pa.Table.from_batches([batch]))
+
+  def _close_results(self):
+    self.results_writer.close()
+    self.outfile.close()
+
+def columnar_to_tsv(filename, outfile):
+  """
+  Converts a binary columnar results file to the tab-separated format
+  expected by the database loader (``\\N`` for missing values).
+  """
+  pa = import_pyarrow()
+  if results_format_of(filename) == "arrow":
+    with pa.memory_map(str(filename)) as source:
+      reader = pa.ipc.open_file(source)
+      batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+      _write_tsv_batches(batches, outfile)
+  else:
+    parquet_file = pa.parquet.ParquetFile(str(filename))
+    _write_tsv_batches(parquet_file.iter_batches(), outfile)
+
+def _tsv_value(value):
+  if value is None:
+    return "\\N"
+  elif isinstance(value, bool):
+    return "1" if value else "0"
+  return str(value)
+
+def _write_tsv_batches(batches, outfile):
+  for batch in batches:
+    columns = [column.to_pylist() for column in batch.columns]
+    outfile.write("".join(["\t".join([_tsv_value(v) for v in row]) + "\n" \
+                           for row in zip(*columns)]))
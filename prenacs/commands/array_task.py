@@ -2,15 +2,27 @@
 
 """
 Runs a plugin passing the parameters obtained from a dump file,
-passing the <task_id>-th line of the <input_list_file> file
-as input entity ID/filename
+on the input entity IDs/filenames of the <task_id>-th slice of
+the <input_list> (each slice consists of --units-per-task
+consecutive units)
+
+The <input_list> is an indexed input list file
+(see prenacs.input_list), from which only the slice is read.
+
+The outputs are written to the file <output_dir>/<task_id>, as a
+dill-dumped list of (output, exception) tuples, one for each unit
+of the slice.
 
 Usage:
   prenacs array-task [options] <plugin> <dumped_params> \
-                               <dumped_input_list> <task_id> \
+                               <input_list> <task_id> \
                                <output_dir>
 
 Options:
+  --units-per-task N       number of consecutive units computed by the task
+                           [default: 1]
+  --processes N            number of processes used for computing the units
+                           [default: 1]
   --quiet, -q              suppress output
   --debug, -d              debug mode
   --verbose, -v            be verbose
@@ -18,14 +30,21 @@ Options:
   --help, -h               show this help message
 """
 
+import os
 import docopt
 import multiplug
 import dill
 from pathlib import Path
+from schema import Schema, And, Use
 from prenacs import plugins_helper, __version__
+from prenacs.batch_computation import compute_units
+from prenacs.input_list import IndexedInputList
 
 def validated(args):
-  return args
+  return Schema({"<task_id>": And(Use(int), lambda n: n>=0),
+                 "--units-per-task": And(Use(int), lambda n: n>0),
+                 "--processes": And(Use(int), lambda n: n>0),
+                 object: object}).validate(args)
 
 def main(args):
   args = validated(args)
@@ -36,17 +55,19 @@ def main(args):
   params = dill.load(params_file)
   params_file.close()
 
-  input_list_file = open(args["<dumped_input_list>"], "rb")
-  input_list = dill.load(input_list_file)
-  unit_id = input_list[int(args["<task_id>"])]
-  input_list_file.close()
+  start = args["<task_id>"] * args["--units-per-task"]
+  with IndexedInputList(args["<input_list>"]) as input_list:
+    unit_ids = input_list.slice(start, start + args["--units-per-task"])
 
-  results, *logs = plugin.compute(unit_id, **params)
+  outcomes = compute_units(plugin, unit_ids, params, args["--processes"])
 
   Path(args["<output_dir>"]).mkdir(parents=True, exist_ok=True)
-  outfile = open(Path(args["<output_dir>"])/args["<task_id>"], "wb")
-  dill.dump((results, logs), outfile)
+  outfilename = Path(args["<output_dir>"])/str(args["<task_id>"])
+  tmpfilename = f"{outfilename}.{os.getpid()}.tmp"
+  outfile = open(tmpfilename, "wb")
+  dill.dump(outcomes, outfile)
   outfile.close()
+  os.replace(tmpfilename, outfilename)
 
 if __name__ == "__main__":
   args = docopt.docopt(__doc__, version=__version__)
@@ -37,7 +37,8 @@ Input:
 
 Output:
 - computation results: TSV file, where the first column contains the IDs,
-  the following columns are the results in the order specified by the plugin
+  the following columns are the results in the order specified by the plugin;
+  alternatively a binary columnar file (Arrow IPC or Parquet, --results-format)
 - logs: TSV file, first column are the unit IDs, followed by information
   messages returned by the plugin (each computation can generate zero, one
   or multiple lines)
@@ -45,25 +46,107 @@ Output:
   version, parameters, username, hostname, etc.
 
 Options:
-  --idsproc FNAME          Python/Nim/Rust module, providing compute_id(str)->str;
-                           allows to edit the IDs/filenames used for (1) results;
-                           (2) --skip option; (3) in "ids" mode only: input to the
+  --idsproc FNAME          Python/Nim/Rust module, providing
+                           compute_id(str)->str; allows to edit the
+                           IDs/filenames used for (1) results; (2) --skip
+                           option; (3) in "ids" mode only: input to the
                            compute() function
-  --skip, -s FNAME         skip computations for which the ID is contained in this
-                           file (one ID per line, or TSV with IDs in first column)
+  --skip, -s FNAME         skip computations for which the ID is contained in
+                           this file (one ID per line, or TSV with IDs in first
+                           column)
   --out, -o FNAME          output results to file (default: stdout);
                            if the file exists, the output is appended
-                           and the file is used also for skipping previously computed
-                           results (unless a different file is specified with --skip)
+                           and the file is used also for skipping previously
+                           computed results (unless a different file is
+                           specified with --skip)
+  --incremental            (with --out) only compute new units and units whose
+                           input file was modified since it was computed;
+                           the previous results of recomputed units are removed
+                           from the output and log files
   --log, -l FNAME          write logs to the given file (default: stderr);
                            if the file exists, the output is appended
-  --mode MODE              select the computation mode (default: parallel)
-                           modes: serial, parallel (uses multiprocessing), slurm
-  --slurm-submitter FNAME  define the path to the batch script which will be passed to sbatch     
-  --slurm-outdir DIRNAME   define the directory for the output of single tasks (default: current directory)
+  --results-format FMT     format of the results file: tsv, arrow (Arrow IPC
+                           file) or parquet [default: tsv]; arrow and parquet
+                           require a new output file (--out) and the pyarrow
+                           package
+  --attrdefs FNAME         YAML attribute definitions file, used for typing the
+                           columns of arrow/parquet results (default: strings)
+  --fsync-interval SECS    sync the output files to disk every SECS seconds
+  --fsync-every N          sync the output files to disk every N computed units
+  --writer-thread          write the output files in a background thread
+  --mode MODE              select the computation mode [default: parallel]
+                           modes: serial, parallel (uses multiprocessing),
+                           threads (for plugins releasing the GIL),
+                           async (uses asyncio, for I/O-bound plugins), slurm
+  --schedule S             order in which the units are computed
+                           [default: input]
+                           input: input order; size: largest input files first;
+                           cost: highest plugin estimate_cost() first
+  --chunk-size N           number of input units processed by each worker
+                           call or compute_batch() call (default: 1,
+                           or 64 if the plugin provides compute_batch())
+  --max-inflight N         (parallel/threads mode) max number of chunks
+                           submitted to the workers at once
+                           (default: 4 x number of CPUs)
+  --per-worker-init        (parallel mode) run the plugin initialize() in each
+                           worker process instead of once in the main process,
+                           and the plugin finalize() in each worker process
+  --timeout SECS           (parallel mode) time limit for the computation of
+                           each unit; hung or crashed workers are replaced
+  --max-tasks-per-worker N
+                           (parallel mode) replace the worker processes, when
+                           one of them has processed N chunks
+  --max-worker-rss MB      (parallel mode) replace the worker processes, when
+                           the resident memory of one of them exceeds MB MiB
+  --threads N              (threads mode) number of threads
+                           (default: number of CPUs + 4, max 32)
+  --concurrency N          (async mode) max number of units computed
+                           concurrently (default: 64)
+  --fused FNAME            YAML file listing further plugins, which are computed
+                           in the same pass over the input units (serial,
+                           parallel or threads mode); each list element has the
+                           keys: plugin, and optionally: out, log, report,
+                           params (YAML file), failures
+  --input-loader FNAME     Python/Nim/Rust module, providing load_input(str);
+                           the input of each unit is loaded once and passed to
+                           the plugins declaring SHARED_INPUT instead of the ID
+  --preload-input          (parallel mode, with --input-loader) load the inputs
+                           in a thread of the main process, ahead of the
+                           workers, and copy them once to shared memory;
+                           load_input() must return bytes-like data
+  --cache DIR              cache the plugin outputs in this directory and reuse
+                           them for units with the same plugin ID/version,
+                           parameters and input
+  --cache-size MB          max total size of the cache in MiB; the least
+                           recently used outputs are removed
+                           (default: unlimited)
+  --cache-fingerprint M    how cached input files are compared [default: stat]
+                           stat: path, mtime and size; content: file content
+  --continue-on-error      do not stop the computation if the computation of
+                           a unit fails; the failed units are written to the
+                           failures file (see --failures)
+  --failures FNAME         (with --continue-on-error) output failed units to
+                           file (default: stderr); TSV with columns: ID, input,
+                           error class, error message, traceback
+  --slurm-submitter FNAME  define the path to the batch script which will be
+                           passed to sbatch
+  --slurm-outdir DIRNAME   define the directory for the output of single tasks
+                           (default: current directory)
+  --slurm-units-per-task N  number of consecutive units computed by each
+                           array task [default: 1]
+  --slurm-task-processes N  number of processes used by each array task
+                           [default: 1]
+  --slurm-resubmissions N  resubmit the tasks which failed, timed out or were
+                           preempted, up to N times [default: 0]
+  --slurm-resubmit-mem L   comma-separated memory per CPU requested by each
+                           resubmission (e.g. 4G,8G; the last value is used for
+                           further resubmissions)
+  --slurm-resubmit-time L  comma-separated time limits of each resubmission
+                           (e.g. 02:00:00,08:00:00)
   --report, -r FN          computation report file (default: stderr)
   --user U                 user_id for the report (default: getpass.getuser())
-  --system S               system_id for the report (default: socket.gethostname())
+  --system S               system_id for the report
+                           (default: socket.gethostname())
   --reason R               reason field for the report (default: None)
   --params FNAME           YAML file with additional parameters (default: None)
   --quiet, -q              suppress output
@@ -73,13 +156,21 @@ Options:
   --help, -h               show this help message
 """
 
-from schema import Or
+from schema import Or, And, Use, SchemaError
 import os
+import yaml
 import sys
 import snacli
 from prenacs import BatchComputation, __version__
+from prenacs.columnar_results import RESULTS_FORMATS
+from prenacs.results_cache import ResultsCache
 from prenacs.commands import helpers as scripts_helpers
 
+def valid_fused_specs(specs):
+  return isinstance(specs, list) and \
+      all(isinstance(spec, dict) and os.path.exists(spec.get("plugin", "")) \
+          for spec in specs)
+
 def validated(args):
   args = scripts_helpers.validate(args, scripts_helpers.report.ARGS_SCHEMA,
       {"<globpattern>": Or(None, str),
@@ -90,12 +181,97 @@ def validated(args):
        "--out": Or(None, str),
        "--log": Or(None, str),
        "--skip": Or(None, os.path.exists),
+       "--results-format": lambda f: f in RESULTS_FORMATS,
+       "--attrdefs": Or(None, And(str, Use(open), Use(yaml.safe_load))),
+       "--schedule": lambda s: s in BatchComputation.SCHEDULES,
+       "--chunk-size": scripts_helpers.common.OPTPOSINT_VALIDATOR,
+       "--max-inflight": scripts_helpers.common.OPTPOSINT_VALIDATOR,
+       "--threads": scripts_helpers.common.OPTPOSINT_VALIDATOR,
+       "--concurrency": scripts_helpers.common.OPTPOSINT_VALIDATOR,
+       "--fsync-interval": Or(None, And(Use(float), lambda n: n>0)),
+       "--timeout": Or(None, And(Use(float), lambda n: n>0)),
+       "--max-tasks-per-worker": scripts_helpers.common.OPTPOSINT_VALIDATOR,
+       "--max-worker-rss": Or(None, And(Use(float), lambda n: n>0)),
+       "--fsync-every": scripts_helpers.common.OPTPOSINT_VALIDATOR,
+       "--failures": Or(None, str),
+       "--fused": Or(None, And(str, Use(open), Use(yaml.safe_load),
+                               valid_fused_specs)),
+       "--input-loader": Or(None, os.path.exists),
+       "--cache": Or(None, str),
+       "--cache-size": Or(None, And(Use(float), lambda n: n>0)),
+       "--cache-fingerprint": lambda f: f in ResultsCache.FINGERPRINTS,
        "--slurm-submitter": Or(None, os.path.exists),
-       "--slurm-outdir": Or(None, str)})
-  if args["--skip"] is None and args["--out"]:
-     args["--skip"] = args["--out"]
+       "--slurm-outdir": Or(None, str),
+       "--slurm-units-per-task": And(Use(int), lambda n: n>0),
+       "--slurm-task-processes": And(Use(int), lambda n: n>0),
+       "--slurm-resubmissions": And(Use(int), lambda n: n>=0),
+       "--slurm-resubmit-mem": Or(None, Use(lambda s: s.split(","))),
+       "--slurm-resubmit-time": Or(None, Use(lambda s: s.split(",")))})
+  if args["--incremental"] and (not args["--out"] or \
+      args["--results-format"] != "tsv"):
+    raise SchemaError("--incremental requires a tsv output file (--out)")
+  if args["--incremental"] and args["--fused"]:
+    for i, spec in enumerate(args["--fused"], 1):
+      if not spec.get("out"):
+        raise SchemaError("--incremental requires an output file (out) "+\
+            f"for each fused plugin; it is missing in the --fused entry {i} "+\
+            f"(plugin: {spec['plugin']})")
+  if args["--skip"] is None and args["--out"] and \
+      args["--results-format"] == "tsv" and not args["--incremental"]:
+    args["--skip"] = args["--out"]
   return args
 
+def setup_execution(batch_computation, args):
+  batch_computation.set_parallel_params(args["--chunk-size"],
+                                        args["--max-inflight"],
+                                        args["--per-worker-init"],
+                                        args["--timeout"],
+                                        args["--max-tasks-per-worker"],
+                                        args["--max-worker-rss"])
+  batch_computation.set_threads_params(args["--threads"])
+  batch_computation.set_async_params(args["--concurrency"])
+
+def setup_output(batch_computation, outfilename, logfilename, args):
+  batch_computation.set_output(outfilename, logfilename,
+      fsync_interval=args["--fsync-interval"],
+      fsync_every=args["--fsync-every"],
+      background_writer=args["--writer-thread"],
+      results_format=args["--results-format"],
+      definitions=args["--attrdefs"])
+  if args["--incremental"]:
+    batch_computation.set_incremental()
+
+def resubmission_options(args):
+  """
+  The additional sbatch options of each resubmission
+  of the failed tasks of a job array.
+  """
+  mem = args["--slurm-resubmit-mem"] or []
+  time = args["--slurm-resubmit-time"] or []
+  options = []
+  for i in range(max(len(mem), len(time))):
+    options.append([])
+    if mem:
+      options[-1].append(f"--mem-per-cpu={mem[min(i, len(mem)-1)]}")
+    if time:
+      options[-1].append(f"--time={time[min(i, len(time)-1)]}")
+  return options
+
+def fused_computation(spec, args):
+  batch_computation = BatchComputation(spec["plugin"], args["--verbose"])
+  setup_execution(batch_computation, args)
+  setup_output(batch_computation, spec.get("out"), spec.get("log"), args)
+  batch_computation.set_failure_params(args["--continue-on-error"],
+                                       spec.get("failures"))
+  params = {}
+  if spec.get("params"):
+    with open(spec["params"]) as f:
+      params = yaml.safe_load(f)
+  batch_computation.setup_computation(params,
+      open(spec["report"], "w") if spec.get("report") else sys.stderr,
+      args["--user"], args["--system"], args["--reason"], args["--verbose"])
+  return batch_computation
+
 def main(args):
   args = validated(args)
   batch_computation = BatchComputation(args["<plugin>"], args["--verbose"])
@@ -106,9 +282,27 @@ def main(args):
     batch_computation.input_from_idsfile(args["<idsfile>"], args["<col>"],
         args["--idsproc"], args["--skip"], args["--verbose"])
   if args["--mode"] == "slurm":
-    batch_computation.set_slurm_params(args["<plugin>"], args["--slurm-submitter"],
-      args["--slurm-outdir"])
-  batch_computation.set_output(args["--out"], args["--log"])
+    batch_computation.set_slurm_params(args["<plugin>"],
+      args["--slurm-submitter"], args["--slurm-outdir"],
+      args["--slurm-units-per-task"], args["--slurm-task-processes"],
+      args["--slurm-resubmissions"], resubmission_options(args))
+  batch_computation.set_schedule(args["--schedule"])
+  setup_execution(batch_computation, args)
+  setup_output(batch_computation, args["--out"], args["--log"], args)
+  if args["--input-loader"]:
+    batch_computation.set_input_loader(args["--input-loader"],
+                                       args["--verbose"],
+                                       args["--preload-input"])
+  if args["--fused"]:
+    batch_computation.set_fused([fused_computation(spec, args) \
+                                   for spec in args["--fused"]])
+  if args["--cache"]:
+    batch_computation.set_cache(args["--cache"],
+        int(args["--cache-size"] * (1 << 20)) if args["--cache-size"] \
+            else None,
+        args["--cache-fingerprint"])
+  batch_computation.set_failure_params(args["--continue-on-error"],
+                                       args["--failures"])
   batch_computation.setup_computation(args["--params"], args["--report"],
       args["--user"], args["--system"], args["--reason"], args["--verbose"])
   try:
@@ -120,10 +314,23 @@ def main(args):
   batch_computation.finalize()
 
 with snacli.args(scripts_helpers.report.SNAKE_ARGS,
-                 input=["<plugin>", "--idsproc"],
-                 log=["--out", "--log"],
+                 input=["<plugin>", "--idsproc", "--attrdefs", "--fused",
+                        "--input-loader"],
+                 log=["--out", "--log", "--failures"],
                  params=["<globpattern>", "<idsfile>", "<col>", "--verbose",
-                         "--skip", "--mode", "--slurm-outdir", "--slurm-tmpdir"],
+                         "--skip", "--incremental", "--results-format",
+                         "--mode", "--schedule",
+                         "--chunk-size", "--max-inflight", "--per-worker-init",
+                         "--preload-input",
+                         "--timeout",
+                         "--max-tasks-per-worker", "--max-worker-rss",
+                         "--threads", "--concurrency", "--continue-on-error",
+                         "--cache", "--cache-size", "--cache-fingerprint",
+                         "--fsync-interval", "--fsync-every",
+                         "--writer-thread", "--slurm-outdir", "--slurm-tmpdir",
+                         "--slurm-units-per-task",
+                         "--slurm-task-processes", "--slurm-resubmissions",
+                         "--slurm-resubmit-mem", "--slurm-resubmit-time"],
                  version=__version__) as args:
   if args:
     main(args)
@@ -10,7 +10,8 @@ given in plugins/README.md.
 
 The following is checked:
 - the signature of the compute function and, optionally of
-  the initialize, finalize (for Python plugins only)
+  the compute_batch, estimate_cost, initialize, finalize
+  (for Python plugins only)
 - the existance, type and value of the plugin constants
 - all the attributes declared in the OUTPUT constant must be
   contained in the given attribute definitions file
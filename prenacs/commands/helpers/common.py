@@ -6,6 +6,7 @@ from schema import Or, And, Use, Optional, Schema
 
 COLNUM_VALIDATOR = And(Use(int), lambda n: n>0)
 OPTCOLNUM_VALIDATOR = Or(And(None, Use(lambda n: 1)), COLNUM_VALIDATOR)
+OPTPOSINT_VALIDATOR = Or(None, And(Use(int), lambda n: n>0))
 
 ARGS_DOC = """\
   --verbose, -v    be verbose
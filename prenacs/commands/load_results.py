@@ -19,6 +19,7 @@ Arguments:
   dbsocket:     connection socket file
   results:      results file, tsv with columns:
                 accession, attr_class, attr_instance, value[, score]
+                or binary columnar file (Arrow IPC or Parquet; requires pyarrow)
   report:       computation report file (yaml format)
   plugin:       plugin used for the computation
 
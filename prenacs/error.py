@@ -5,3 +5,11 @@ Exceptions for the library
 class PrenacsError(Exception):
   """parent class for package-specific errors"""
   pass
+
+class UnitTimeoutError(PrenacsError):
+  """the computation of an input unit exceeded the time limit"""
+  pass
+
+class WorkerCrashError(PrenacsError):
+  """a worker process terminated abruptly while computing an input unit"""
+  pass
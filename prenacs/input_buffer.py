@@ -0,0 +1,177 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+"""
+Memory-mapped access to the input files, for use in plugins.
+
+Instead of reading an input file line by line, a plugin can map it in
+memory and scan it using functions implemented in C, such as the
+``find`` method of the mapped file, regular expressions, ``count``
+(see below) or NumPy (``numpy.frombuffer``). The mapped pages are shared
+with any other process mapping or reading the same file on the node
+(page cache).
+
+Gzip-compressed files are decompressed once to a cache directory
+and the decompressed file is mapped. The decompressed file is named
+after the path, modification time and size of the compressed file, thus
+it is reused by other plugins and later computations on the same file,
+as long as the compressed file does not change.
+
+The total size of the cache directory is limited: when it exceeds the
+maximal size, the least recently used decompressed files are removed
+(see ``decompressed_path``).
+"""
+
+import os
+import re
+import mmap
+import gzip
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+GZIP_MAGIC = b"\x1f\x8b"
+CACHEDIR_ENV = "PRENACS_INPUT_CACHE"
+CACHESIZE_ENV = "PRENACS_INPUT_CACHE_SIZE"
+DEFAULT_CACHE_SIZE = 10 << 30
+EVICTION_TARGET = 0.9
+COPY_BLOCK_SIZE = 1 << 20
+
+def is_gzipped(filename):
+  """
+  Checks if a file is gzip-compressed, from its first bytes.
+  """
+  with open(filename, "rb") as f:
+    return f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+def default_cachedir():
+  """
+  The directory where the decompressed files are stored by default:
+  the value of the PRENACS_INPUT_CACHE environment variable, if set,
+  otherwise the ``prenacs_input_cache`` subdirectory of the
+  temporary files directory.
+  """
+  return os.environ.get(CACHEDIR_ENV,
+            os.path.join(tempfile.gettempdir(), "prenacs_input_cache"))
+
+def default_cache_size():
+  """
+  The maximal total size of the decompressed files, in bytes, by default:
+  the value of the PRENACS_INPUT_CACHE_SIZE environment variable, if set,
+  otherwise DEFAULT_CACHE_SIZE.
+  """
+  return int(os.environ.get(CACHESIZE_ENV, DEFAULT_CACHE_SIZE))
+
+def _evict(cachedir, max_size, keep):
+  entries = []
+  for entry in os.scandir(cachedir):
+    if entry.is_file() and not entry.name.endswith(".tmp"):
+      try:
+        st = entry.stat()
+      except FileNotFoundError:
+        continue
+      entries.append((st.st_mtime, st.st_size, entry.path))
+  size = sum(entry[1] for entry in entries)
+  if size <= max_size:
+    return
+  target = max_size * EVICTION_TARGET
+  for mtime, entry_size, path in sorted(entries):
+    if size <= target:
+      break
+    if path == keep:
+      continue
+    try:
+      # the mappings of the file, if any, remain valid
+      os.unlink(path)
+    except FileNotFoundError:
+      pass
+    size -= entry_size
+
+def decompressed_path(filename, cachedir = None, max_size = None):
+  """
+  Decompresses a gzip-compressed file to the cache directory,
+  unless it was already done, and returns the path of the
+  decompressed file.
+
+  The decompressed file is written to a temporary file, which is then
+  renamed, thus multiple processes can decompress the same file
+  concurrently.
+
+  The modification time of the decompressed file is updated when it
+  is reused. After decompressing a file, if the total size of the cache
+  directory exceeds ``max_size`` bytes (default: see
+  ``default_cache_size``), the least recently used decompressed files
+  are removed, until the total size is below EVICTION_TARGET times
+  ``max_size`` (the file just decompressed is kept in any case).
+  """
+  cachedir = cachedir or default_cachedir()
+  if max_size is None:
+    max_size = default_cache_size()
+  os.makedirs(cachedir, exist_ok=True)
+  st = os.stat(filename)
+  key = hashlib.blake2b(f"{os.path.abspath(filename)}\0{st.st_mtime_ns}\0"\
+                        f"{st.st_size}".encode(), digest_size=16).hexdigest()
+  path = os.path.join(cachedir, key)
+  try:
+    os.utime(path)
+    return path
+  except FileNotFoundError:
+    pass
+  tmpname = f"{path}.{os.getpid()}.tmp"
+  try:
+    with gzip.open(filename, "rb") as src, open(tmpname, "wb") as dst:
+      shutil.copyfileobj(src, dst, COPY_BLOCK_SIZE)
+    os.replace(tmpname, path)
+  finally:
+    if os.path.exists(tmpname):
+      os.unlink(tmpname)
+  _evict(cachedir, max_size, path)
+  return path
+
+@contextmanager
+def mapped_input(filename, decompress = True, cachedir = None,
+                 max_size = None):
+  """
+  Maps an input file in memory (read-only).
+
+  If ``decompress`` is set and the file is gzip-compressed, the
+  decompressed file (see ``decompressed_path``, for the ``cachedir`` and
+  ``max_size`` arguments) is mapped instead.
+
+  Yields:
+    mmap.mmap: The mapped file content (a bytes-like object, which can be
+               sliced and supports e.g. ``find`` and ``rfind``);
+               for empty files, empty bytes are yielded instead.
+
+  Example:
+    with mapped_input(filename) as data:
+      n_lines = count(data, b"\\n")
+  """
+  if decompress and is_gzipped(filename):
+    filename = decompressed_path(filename, cachedir, max_size)
+  with open(filename, "rb") as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      yield b""
+      return
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  try:
+    yield data
+  finally:
+    try:
+      data.close()
+    except BufferError:
+      # still referenced (e.g. by a NumPy array): unmapped when released
+      pass
+
+def count(data, sub):
+  """
+  Counts the non-overlapping occurrences of ``sub`` in a mapped input
+  (as ``bytes.count``), without copying the whole content to memory.
+  """
+  if hasattr(data, "count"):
+    return data.count(sub)
+  if len(sub) != 1:
+    return sum(1 for _ in re.finditer(re.escape(sub), data))
+  return sum(data[i:i+COPY_BLOCK_SIZE].count(sub) \
+               for i in range(0, len(data), COPY_BLOCK_SIZE))
@@ -0,0 +1,93 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+import os
+
+class InputFingerprints():
+  """
+  The fingerprints of the inputs of the units computed to a results file,
+  used for incremental recomputation.
+
+  The fingerprints are stored in a sidecar file, named as the results file,
+  with the ``.fingerprints`` suffix. This is a tab-separated file, with the
+  output ID and the fingerprint of the input of each computed unit.
+
+  The fingerprint of an input file consists of its modification time
+  (in nanoseconds) and size. If the input ID is not the name of an existing
+  file, the fingerprint is empty, i.e. the unit is only recomputed, if
+  it was not computed before.
+
+  Attributes:
+    filename (str): The path to the sidecar file.
+    recorded (dict): The fingerprints by output ID.
+    updated (set): The output IDs of the units recomputed since the
+                   sidecar file was loaded.
+  """
+
+  SIDECAR_SUFFIX = ".fingerprints"
+
+  @staticmethod
+  def fingerprint(input_id):
+    """
+    Computes the fingerprint of an input unit (a str).
+    """
+    try:
+      st = os.stat(input_id)
+    except (OSError, TypeError, ValueError):
+      return ""
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+  def __init__(self, resultsfilename):
+    self.filename = resultsfilename + self.SIDECAR_SUFFIX
+    self.recorded = {}
+    self.updated = set()
+    if os.path.exists(self.filename):
+      with open(self.filename) as f:
+        for line in f:
+          fields = line.rstrip("\n").split("\t")
+          if len(fields) == 2:
+            self.recorded[fields[0]] = fields[1]
+
+  def is_current(self, output_id, fingerprint):
+    """
+    Checks if the unit was computed from an input with the given fingerprint.
+    """
+    return self.recorded.get(output_id) == fingerprint
+
+  def record(self, output_id, fingerprint):
+    """
+    Records the fingerprint of the input of a computed unit.
+    """
+    self.recorded[output_id] = fingerprint
+    self.updated.add(output_id)
+
+  def save(self):
+    """
+    Writes the fingerprints to the sidecar file.
+    """
+    tmpname = f"{self.filename}.{os.getpid()}.tmp"
+    with open(tmpname, "w") as f:
+      for output_id, fingerprint in self.recorded.items():
+        f.write(f"{output_id}\t{fingerprint}\n")
+    os.replace(tmpname, self.filename)
+
+  def supersede_rows(self, filename, previous_size):
+    """
+    Removes from a tab-separated file (the results or log file) the lines
+    written before the current computation (i.e. in the first
+    ``previous_size`` bytes) for the recomputed units, whose output ID
+    is in the first column.
+    """
+    if previous_size == 0 or not self.updated:
+      return
+    tmpname = f"{filename}.{os.getpid()}.tmp"
+    with open(filename, "rb") as src, open(tmpname, "wb") as dst:
+      offset = 0
+      for line in src:
+        offset += len(line)
+        if offset <= previous_size and \
+            line.split(b"\t", 1)[0].rstrip(b"\r\n").decode() in self.updated:
+          continue
+        dst.write(line)
+    os.replace(tmpname, filename)
@@ -0,0 +1,94 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+import sys
+import struct
+from array import array
+from prenacs.error import PrenacsError
+
+class IndexedInputList():
+  """
+  A file containing the input IDs of a computation, indexed by position,
+  so that a slice of the list (e.g. the input units of a Slurm array task)
+  can be read without reading and deserializing the whole list.
+
+  The file consists of a header (magic string and number of IDs),
+  a table of n+1 offsets (unsigned 64-bit integers, little endian) and
+  the UTF-8 encoded IDs, concatenated. The i-th ID is stored between the
+  offsets i and i+1 of the data section, thus reading a slice requires
+  two reads: the offsets of the slice and the IDs.
+
+  Usage:
+    with open(filename, "wb") as f:
+      IndexedInputList.write(f, input_ids)
+    with IndexedInputList(filename) as input_list:
+      unit_ids = input_list.slice(start, stop)
+  """
+
+  MAGIC = b"PRNCSILS"
+  HEADER = struct.Struct("<8sQ")
+  OFFSET_SIZE = array("Q").itemsize
+
+  @staticmethod
+  def _swap_if_big_endian(offsets):
+    if sys.byteorder == "big":
+      offsets = array("Q", offsets)
+      offsets.byteswap()
+    return offsets
+
+  @classmethod
+  def write(cls, outfile, input_ids):
+    """
+    Writes a list of input IDs (str) as indexed input list
+    to a file opened in binary mode.
+    """
+    offsets = array("Q", [0])
+    for input_id in input_ids:
+      offsets.append(offsets[-1] + len(input_id.encode()))
+    outfile.write(cls.HEADER.pack(cls.MAGIC, len(offsets) - 1))
+    cls._swap_if_big_endian(offsets).tofile(outfile)
+    for input_id in input_ids:
+      outfile.write(input_id.encode())
+
+  def __init__(self, filename):
+    self.file = open(filename, "rb")
+    try:
+      magic, self.n_ids = \
+          self.HEADER.unpack(self.file.read(self.HEADER.size))
+    except struct.error:
+      magic = None
+    if magic != self.MAGIC:
+      self.file.close()
+      raise PrenacsError(f"{filename} is not an indexed input list file")
+    self.data_offset = self.HEADER.size + \
+        (self.n_ids + 1) * self.OFFSET_SIZE
+
+  def __len__(self):
+    return self.n_ids
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def close(self):
+    self.file.close()
+
+  def slice(self, start, stop):
+    """
+    Reads the input IDs from position ``start`` to ``stop`` (excluded);
+    as for list slices, the range is limited to the length of the list.
+    """
+    start, stop = min(start, self.n_ids), min(stop, self.n_ids)
+    if start >= stop:
+      return []
+    self.file.seek(self.HEADER.size + start * self.OFFSET_SIZE)
+    offsets = array("Q")
+    offsets.fromfile(self.file, stop - start + 1)
+    offsets = self._swap_if_big_endian(offsets)
+    self.file.seek(self.data_offset + offsets[0])
+    data = self.file.read(offsets[-1] - offsets[0])
+    return [data[offsets[i] - offsets[0]:offsets[i+1] - offsets[0]].decode() \
+              for i in range(stop - start)]
@@ -35,28 +35,50 @@ class PluginInterfaceAnalyser():
     else:
       self._success("plugin provides a compute function")
     if self.plugin.__lang__ == "python":
-      compute_spec = inspect.getfullargspec(self.plugin.compute)
-      if compute_spec.varargs is not None:
+      self._check_compute_signature("compute")
+
+  def _check_compute_signature(self, fname):
+    compute_spec = inspect.getfullargspec(getattr(self.plugin, fname))
+    if compute_spec.varargs is not None:
+      self._error(\
+          f"plugin.{fname}() accepts variable positional arguments")
+    if not hasattr(self.plugin, "initialize"):
+      if len(compute_spec.args) != 1:
         self._error(\
-            "plugin.compute() accepts variable positional arguments")
-      if not hasattr(self.plugin, "initialize"):
-        if len(compute_spec.args) != 1:
-          self._error(\
-              "plugin.compute() does not accept a single positional argument")
-      else:
-        if (len(compute_spec.args) != 2) or (compute_spec.args[1] != "state"):
-          self._error(\
-              "plugin.compute() in plugin with initialize function "+\
-              "does not accept a state keyword argument")
-      if compute_spec.varkw is None:
+            f"plugin.{fname}() does not accept a single positional argument")
+    else:
+      if (len(compute_spec.args) != 2) or (compute_spec.args[1] != "state"):
         self._error(\
-            "plugin.compute() does not accept variable keywords arguments")
+            f"plugin.{fname}() in plugin with initialize function "+\
+            "does not accept a state keyword argument")
+    if compute_spec.varkw is None:
+      self._error(\
+          f"plugin.{fname}() does not accept variable keywords arguments")
+
+  def _check_compute_batch_function(self):
+    if not hasattr(self.plugin, "compute_batch"):
+      self._info("plugin does not provide a compute_batch function")
+      return
+    self._success("plugin provides a compute_batch function")
+    if self.plugin.__lang__ == "python":
+      self._check_compute_signature("compute_batch")
+
+  def _check_estimate_cost_function(self):
+    if not hasattr(self.plugin, "estimate_cost"):
+      self._info("plugin does not provide an estimate_cost function")
+      return
+    self._success("plugin provides an estimate_cost function")
+    if self.plugin.__lang__ == "python":
+      self._check_compute_signature("estimate_cost")
 
   def _check_initialize_function(self):
     if hasattr(self.plugin, "initialize"):
       self._success("plugin provides an initialize function")
     else:
       self._info("plugin does not provide an initialize function")
+      return
+    if self.plugin.__lang__ != "python":
+      return
     init_spec = inspect.getfullargspec(self.plugin.initialize)
     if (init_spec.varargs is not None) or (len(init_spec.args) > 0):
       self._error(\
@@ -73,6 +95,9 @@ class PluginInterfaceAnalyser():
               "plugin.finalize() defined in plugin without plugin.initialize()")
     else:
       self._info("plugin does not provide a finalize function")
+      return
+    if self.plugin.__lang__ != "python":
+      return
     f_spec = inspect.getfullargspec(self.plugin.finalize)
     if f_spec.varargs is not None:
       self._error(\
@@ -107,6 +132,16 @@ class PluginInterfaceAnalyser():
           else:
             self._success(f"plugin.{const} type and format is valid")
 
+  def _check_boolean_constants(self):
+    for const in ["GIL_FREE", "SHARED_INPUT"]:
+      if hasattr(self.plugin, const):
+        v = getattr(self.plugin, const)
+        if v is not None:
+          if not isinstance(v, bool):
+            self._error(f"plugin.{const} must be a boolean")
+          else:
+            self._success(f"plugin.{const} type is valid")
+
   def _check_output_constant(self, definitions):
     if hasattr(self.plugin, "OUTPUT"):
       if not isinstance(self.plugin.OUTPUT, list):
@@ -153,9 +188,11 @@ class PluginInterfaceAnalyser():
       Runs the analysis on the plugin interface for compliance with the
       interface specification.
 
-      The method checks the compute, initialize, and finalize functions, as well
-      as the mandatory and string constants. If a `definitions` parameter is
-      provided, it also checks the output and parameters constants against it.
+      The method checks the compute, compute_batch and estimate_cost
+      (if provided), initialize and finalize functions, as well as the
+      mandatory, string and boolean constants. If a `definitions` parameter
+      is provided, it also checks the output and parameters constants
+      against it.
 
       If the plugin is not written in Python, the signature of plugin functions
       will not be analyzed (but only their presence).
@@ -166,10 +203,13 @@ class PluginInterfaceAnalyser():
         self._info("signature of plugin functions not analyzed, "+\
             " since it is a {} plugin", self.plugin.__lang__)
       self._check_compute_function()
+      self._check_compute_batch_function()
+      self._check_estimate_cost_function()
       self._check_initialize_function()
       self._check_finalize_function()
       self._check_mandatory_constants()
       self._check_string_constants()
+      self._check_boolean_constants()
       self._check_output_constant(definitions)
       self._check_parameters_constant()
       return 1 if self.had_errors else 0
@@ -3,15 +3,24 @@
 #
 COMPUTE_PLUGIN_INTERFACE = {}
 COMPUTE_PLUGIN_INTERFACE["req_func"] = ["compute"]
-COMPUTE_PLUGIN_INTERFACE["opt_func"] = ["initialize", "finalize"]
+COMPUTE_PLUGIN_INTERFACE["opt_func"] = ["initialize", "finalize",
+                                         "compute_batch", "estimate_cost"]
 COMPUTE_PLUGIN_INTERFACE["req_const"] = ["ID", "VERSION", "INPUT", "OUTPUT"]
 COMPUTE_PLUGIN_INTERFACE["opt_const"] = ["PARAMETERS", "METHOD",
                                          "IMPLEMENTATION", "ADVICE",
                                          "REQ_SOFTWARE", "REQ_HARDWARE"]
 
+# optional constants, which control how the plugin is run,
+# and are not stored in the plugin metadata
+EXECUTION_CONSTANTS = ["GIL_FREE", "SHARED_INPUT"]
+COMPUTE_PLUGIN_INTERFACE["opt_const"] += EXECUTION_CONSTANTS
+
 IDPROC_PLUGIN_INTERFACE = {}
 IDPROC_PLUGIN_INTERFACE["req_func"] = ["compute_id"]
 
+INPUT_LOADER_PLUGIN_INTERFACE = {}
+INPUT_LOADER_PLUGIN_INTERFACE["req_func"] = ["load_input"]
+
 def plugin_metadata_str(plugin):
   """
   Collects the metadata of a plugin.
@@ -22,8 +31,9 @@ def plugin_metadata_str(plugin):
   Returns:
     A dictionary with string values, containing the metadata of the plugin.
   """
-  metadata_keys = COMPUTE_PLUGIN_INTERFACE["req_const"] + \
-                  COMPUTE_PLUGIN_INTERFACE["opt_const"]
+  metadata_keys = [k for k in COMPUTE_PLUGIN_INTERFACE["req_const"] + \
+                              COMPUTE_PLUGIN_INTERFACE["opt_const"] \
+                     if k not in EXECUTION_CONSTANTS]
   result = {k.lower(): getattr(plugin, k) \
               for k in metadata_keys if hasattr(plugin, k)}
   if "output" in result and result["output"] is not None:
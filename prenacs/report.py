@@ -17,6 +17,8 @@ class Report():
     data (dict): A dictionary containing the report data.
     rfile (file): The file object to write the report to.
     n_steps (int): The number of steps in the report.
+    n_failures (int): The number of failed steps, which were skipped
+                      without aborting the computation.
   """
 
   REASONS = ["new_entities", "new_attributes", "recompute"]
@@ -73,6 +75,7 @@ class Report():
     self.data["uuid"] = uuid.uuid4().bytes
     self.data["time_start"] = str(datetime.now())
     self.n_steps = 0
+    self.n_failures = 0
 
   def step(self):
     """
@@ -80,15 +83,27 @@ class Report():
     """
     self.n_steps += 1
 
+  def failure(self):
+    """
+    Increments the number of failed steps in the report by 1.
+    """
+    self.n_failures += 1
+
   def finalize(self):
       """
       Finalizes the report by adding the end time, number of units, and
       computation status to the report data. Then, it dumps the report data to
       the report file, flushes the file, and closes it.
+
+      If some steps failed, the computation status is set to partial and
+      the number of failed steps is stored in the remarks.
       """
       self.data["time_end"] = str(datetime.now())
       self.data["n_units"] = self.n_steps
       self.data["comp_status"] = "completed"
+      if self.n_failures > 0:
+        self.data["comp_status"] = "partial"
+        self.data["remarks"] = yaml.dump({"n_failed_units": self.n_failures})
       yaml.dump(self.data, self.rfile)
       self.rfile.flush()
       if self.rfile != sys.stderr:
@@ -0,0 +1,146 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+import os
+import hashlib
+import yaml
+import dill
+from pathlib import Path
+
+class ResultsCache():
+  """
+  A persistent on-disk cache of the outputs of the plugin compute function.
+
+  Each output is stored in a separate file, named after a key, which is
+  computed from the plugin ID and version, the computation parameters
+  (including the initial ``state``) and a fingerprint of the input unit.
+
+  The input fingerprint is computed, if the input ID is the name of an
+  existing file, either from the path, modification time and size of the
+  file (``stat``, default) or from its content (``content``);
+  otherwise, it is the input ID itself.
+
+  If ``max_size`` is set, when the total size of the cached outputs
+  exceeds ``max_size`` bytes, the least recently used outputs are removed,
+  until the total size is below EVICTION_TARGET times ``max_size``.
+
+  Attributes:
+    cachedir (Path): The directory where the outputs are stored.
+    max_size (int): The maximal total size of the cached outputs, in bytes.
+    fingerprint (str): The input fingerprint method (one of FINGERPRINTS).
+    size (int): The total size of the cached outputs, in bytes
+                (only computed if ``max_size`` is set).
+  """
+
+  FINGERPRINTS = ["stat", "content"]
+  EVICTION_TARGET = 0.9
+  READ_BLOCK_SIZE = 1 << 20
+
+  def __init__(self, cachedir, max_size = None, fingerprint = "stat"):
+    if fingerprint not in self.FINGERPRINTS:
+      raise ValueError(f"Unknown input fingerprint method: {fingerprint}; "+\
+                       "it must be one of: " + ", ".join(self.FINGERPRINTS))
+    self.cachedir = Path(cachedir)
+    self.cachedir.mkdir(parents=True, exist_ok=True)
+    self.max_size = max_size
+    self.fingerprint = fingerprint
+    self.size = self._total_size() if max_size is not None else None
+
+  def _entries(self):
+    for subdir in os.scandir(self.cachedir):
+      if subdir.is_dir():
+        for entry in os.scandir(subdir.path):
+          if entry.is_file() and not entry.name.endswith(".tmp"):
+            yield entry
+
+  def _total_size(self):
+    return sum(entry.stat().st_size for entry in self._entries())
+
+  @staticmethod
+  def computation_digest(plugin, params):
+    """
+    Computes the digest of the plugin ID and version and of the
+    computation parameters, as passed to the computation, i.e. before
+    the plugin initialization: the ``state`` parameter is thus the initial
+    state (e.g. the parameters of ``initialize()``), not the state
+    created by ``initialize()``.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{plugin.ID}\0{plugin.VERSION}\0".encode())
+    h.update(yaml.dump(params, sort_keys=True).encode())
+    return h.digest()
+
+  def _input_fingerprint(self, input_id):
+    if not isinstance(input_id, str) or not os.path.isfile(input_id):
+      return f"id\0{input_id}".encode()
+    if self.fingerprint == "stat":
+      st = os.stat(input_id)
+      return f"stat\0{os.path.abspath(input_id)}\0{st.st_mtime_ns}\0"\
+             f"{st.st_size}".encode()
+    h = hashlib.blake2b(digest_size=16)
+    with open(input_id, "rb") as f:
+      for block in iter(lambda: f.read(self.READ_BLOCK_SIZE), b""):
+        h.update(block)
+    return b"content\0" + h.digest()
+
+  def key(self, computation_digest, input_id):
+    """
+    Computes the cache key of an input unit (a hex string).
+
+    Args:
+      computation_digest (bytes): see ``computation_digest``
+      input_id (str): The input ID passed to the plugin compute function.
+    """
+    h = hashlib.blake2b(computation_digest, digest_size=20)
+    h.update(self._input_fingerprint(input_id))
+    return h.hexdigest()
+
+  def _path(self, key):
+    return self.cachedir / key[:2] / key
+
+  def get(self, key):
+    """
+    Returns the cached output for the given key, or None,
+    if it is not in the cache.
+    """
+    path = self._path(key)
+    try:
+      with open(path, "rb") as f:
+        output = dill.load(f)
+    except (OSError, EOFError, dill.UnpicklingError):
+      return None
+    try:
+      os.utime(path)
+    except OSError:
+      pass
+    return output
+
+  def put(self, key, output):
+    """
+    Stores the output for the given key in the cache.
+    """
+    path = self._path(key)
+    path.parent.mkdir(exist_ok=True)
+    tmpname = f"{path}.{os.getpid()}.tmp"
+    with open(tmpname, "wb") as f:
+      dill.dump(output, f)
+    os.replace(tmpname, path)
+    if self.size is not None:
+      self.size += os.path.getsize(path)
+      if self.size > self.max_size:
+        self._evict()
+
+  def _evict(self):
+    entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) \
+                      for e in self._entries()))
+    self.size = sum(entry[1] for entry in entries)
+    target = self.max_size * self.EVICTION_TARGET
+    for mtime, size, path in entries:
+      if self.size <= target:
+        break
+      try:
+        os.unlink(path)
+      except OSError:
+        continue
+      self.size -= size
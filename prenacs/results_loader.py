@@ -5,9 +5,12 @@
 import multiplug
 import yaml
 import os
+import tempfile
 from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 from prenacs import plugins_helper, PluginDescription, ComputationReport
+from prenacs.columnar_results import results_format_of, columnar_to_tsv, \
+                                     COLUMNAR_FORMATS
 
 class ResultsLoader():
   """
@@ -100,38 +103,47 @@ class ResultsLoader():
     session.commit()
     return uuid
 
-def run(self, results_file, report_file, replace_report_record=False,
-    verbose=False):
-  """
-  Loads computation results and reports into a database.
+  def run(self, results_file, report_file, replace_report_record=False,
+          verbose=False):
+    """
+    Loads computation results and reports into a database.
 
-  It first checks that the results file is not empty, and then processes the
-  computation report to extract the computation ID. Finally, it loads the
-  computation results into the database using the `load_computation` method of
-  the `AttributeValueTables` object.
+    It first checks that the results file is not empty, and then processes
+    the computation report to extract the computation ID. Finally, it loads
+    the computation results into the database using the `load_computation`
+    method of the `AttributeValueTables` object.
 
-  Args:
-    results_file (str): The path to the file containing the computation
-      results.
-    report_file (str): The path to the file containing the computation
-      report.
-    replace_report_record (bool, optional): If `True`, replaces any
-      existing computation report with the same ID in the database.
-      Defaults to `False`.
-    verbose (bool, optional): If `True`, prints additional information
-      during the loading process. Defaults to `False`.
+    The results file can be a tab-separated file or a binary columnar file
+    (Arrow IPC file or Parquet, as written by the batch computation);
+    the format is recognized automatically. Binary columnar files are
+    converted to a temporary tab-separated file, before loading it.
 
-  Raises:
-    RuntimeError: If the results file is empty.
-  """
-  def run(self, results_file, report_file, replace_report_record=False,
-          verbose=False):
+    Args:
+      results_file (str): The path to the file containing the computation
+        results.
+      report_file (str): The path to the file containing the computation
+        report.
+      replace_report_record (bool, optional): If `True`, replaces any
+        existing computation report with the same ID in the database.
+        Defaults to `False`.
+      verbose (bool, optional): If `True`, prints additional information
+        during the loading process. Defaults to `False`.
+
+    Raises:
+      RuntimeError: If the results file is empty.
+    """
     if os.stat(results_file).st_size == 0:
       raise RuntimeError("The results file is empty")
     else:
       computation_id = self._process_computation_report(\
                          report_file, replace_report_record)
-      self.avt.load_computation(computation_id,
-                                self.plugin.OUTPUT,
-                                results_file)
-
+      if results_format_of(results_file) in COLUMNAR_FORMATS:
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".tsv") as tsv:
+          columnar_to_tsv(results_file, tsv)
+          tsv.flush()
+          self.avt.load_computation(computation_id, self.plugin.OUTPUT,
+                                    tsv.name)
+      else:
+        self.avt.load_computation(computation_id,
+                                  self.plugin.OUTPUT,
+                                  results_file)
@@ -0,0 +1,197 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+import os
+import sys
+import queue
+import threading
+from time import monotonic
+
+class ResultsWriter():
+  """
+  Writes the computation results and logs to the output files.
+
+  The results and log lines are collected in memory buffers and written
+  in blocks, when the buffered data exceeds ``buffer_size`` bytes.
+  Optionally, the output files are synced to disk (fsync) every
+  ``fsync_interval`` seconds and/or every ``fsync_every`` units.
+
+  If ``background`` is set, the blocks are written (and synced) by a
+  background thread, so that the caller does not block on disk I/O.
+  An error in the background thread is raised by the next call of
+  ``write``, ``flush`` or ``close``.
+
+  The results are written as tab-separated lines. Subclasses can write
+  the results in a different format, by overriding the methods
+  ``_add_results``, ``_write_results``, ``_flush_results``,
+  ``_sync_results`` and ``_close_results``.
+
+  Attributes:
+    outfile (file): The file to write the results to.
+    logfile (file): The file to write the log messages to.
+    buffer_size (int): The size of the buffered data, in bytes,
+                       after which a block is written.
+    fsync_interval (float): The interval in seconds between fsyncs,
+                            or None.
+    fsync_every (int): The number of units between fsyncs, or None.
+  """
+
+  DEFAULT_BUFFER_SIZE = 1 << 16
+  QUEUE_SIZE = 16
+
+  def __init__(self, outfile = sys.stdout, logfile = sys.stderr,
+               buffer_size = None, fsync_interval = None, fsync_every = None,
+               background = False):
+    self.outfile = outfile
+    self.logfile = logfile
+    self.buffer_size = buffer_size or self.DEFAULT_BUFFER_SIZE
+    self.fsync_interval = fsync_interval
+    self.fsync_every = fsync_every
+    self._out_lines = []
+    self._log_lines = []
+    self._buffered = 0
+    self._units_since_fsync = 0
+    self._last_fsync = monotonic()
+    self._error = None
+    self._queue = None
+    self._thread = None
+    if background:
+      self._queue = queue.Queue(self.QUEUE_SIZE)
+      self._thread = threading.Thread(target=self._background_writer,
+                                      daemon=True)
+      self._thread.start()
+
+  def _check_error(self):
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+
+  def write(self, output_id, results, logs):
+    """
+    Buffers the results and the log messages of a unit.
+
+    Returns:
+      bool: Whether a results line was written (i.e. results is not empty).
+    """
+    self._check_error()
+    has_results = self._add_results(output_id, results)
+    for element in logs:
+      if isinstance(element, list):
+        for subelement in element:
+          if subelement:
+            self._add_log_line(f"{output_id}\t{subelement}\n")
+      elif element:
+        self._add_log_line(f"{output_id}\t{element}\n")
+    self._units_since_fsync += 1
+    fsync = self._fsync_due()
+    if fsync or self._buffered >= self.buffer_size:
+      self._write_block(fsync)
+    return has_results
+
+  def _add_results(self, output_id, results):
+    results = "\t".join([str(r) for r in results])
+    if results:
+      line = f"{output_id}\t{results}\n"
+      self._out_lines.append(line)
+      self._buffered += len(line)
+    return bool(results)
+
+  def _write_results(self, out_lines):
+    self.outfile.write("".join(out_lines))
+
+  def _flush_results(self):
+    self.outfile.flush()
+
+  def _sync_results(self):
+    self.outfile.flush()
+    self._sync(self.outfile)
+
+  def _close_results(self):
+    if self.outfile not in [sys.stdout, sys.stderr]:
+      self.outfile.close()
+
+  def _add_log_line(self, line):
+    self._log_lines.append(line)
+    self._buffered += len(line)
+
+  def _fsync_due(self):
+    if self.fsync_every is not None and \
+        self._units_since_fsync >= self.fsync_every:
+      return True
+    if self.fsync_interval is not None and \
+        monotonic() - self._last_fsync >= self.fsync_interval:
+      return True
+    return False
+
+  def _write_block(self, fsync):
+    block = (self._out_lines, "".join(self._log_lines), fsync)
+    self._out_lines = []
+    self._log_lines = []
+    self._buffered = 0
+    if fsync:
+      self._units_since_fsync = 0
+      self._last_fsync = monotonic()
+    if self._queue is not None:
+      self._queue.put(block)
+    else:
+      self._output_block(*block)
+
+  @staticmethod
+  def _sync(f):
+    try:
+      os.fsync(f.fileno())
+    except (OSError, ValueError, AttributeError):
+      pass
+
+  def _output_block(self, out_lines, log_data, fsync):
+    if out_lines:
+      self._write_results(out_lines)
+    if log_data:
+      self.logfile.write(log_data)
+    if fsync:
+      self._sync_results()
+      self.logfile.flush()
+      self._sync(self.logfile)
+
+  def _background_writer(self):
+    while True:
+      block = self._queue.get()
+      try:
+        if block is None:
+          return
+        elif self._error is None:
+          self._output_block(*block)
+      except Exception as exc:
+        self._error = exc
+      finally:
+        self._queue.task_done()
+
+  def flush(self, fsync = False):
+    """
+    Writes the buffered data to the output files and flushes them.
+    If ``fsync`` is set, the files are also synced to disk.
+    """
+    self._write_block(fsync)
+    if self._queue is not None:
+      self._queue.join()
+    self._check_error()
+    self._flush_results()
+    self.logfile.flush()
+
+  def close(self):
+    """
+    Flushes and syncs the output files, stops the background thread
+    (if any) and closes the output files, unless they are the
+    standard output or standard error.
+    """
+    try:
+      self.flush(fsync = True)
+    finally:
+      if self._thread is not None:
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+      self._close_results()
+      if self.logfile not in [sys.stdout, sys.stderr]:
+        self.logfile.close()
@@ -0,0 +1,94 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+"""
+Passing the inputs parsed by the input loader in the main process
+to the worker processes, through shared memory blocks.
+"""
+
+from multiprocessing import shared_memory
+
+class PreloadedInput():
+  """
+  An input unit, whose input was loaded in the main process.
+
+  The loaded input (a bytes-like object) is copied to a shared memory
+  block, which is attached by the worker process, so that the input is
+  not pickled and sent through the worker pipe. Only the input ID and
+  the name and size of the block are pickled.
+
+  The main process creates the block (when the instance is created)
+  and removes it (``release``), after the unit was computed.
+  The worker process maps the block (``attach``) and unmaps it
+  (``detach``), after the unit was computed.
+
+  Attributes:
+    input_id (str): The input ID.
+    name (str): The name of the shared memory block (None if the loaded
+                input is empty or loading it failed).
+    size (int): The size of the loaded input, in bytes.
+    error (Exception): The exception raised loading the input, or None.
+  """
+
+  def __init__(self, input_id, data = None, error = None):
+    self.input_id = input_id
+    self.name = None
+    self.size = 0
+    self.error = error
+    self._shm = None
+    self._view = None
+    if data is not None:
+      data = memoryview(data).cast("B")
+      self.size = len(data)
+      if self.size > 0:
+        self._shm = shared_memory.SharedMemory(create=True, size=self.size)
+        self._shm.buf[:self.size] = data
+        self.name = self._shm.name
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state["_shm"] = None
+    state["_view"] = None
+    return state
+
+  def attach(self):
+    """
+    Maps the shared memory block in the worker process.
+
+    Returns:
+      tuple: (view, exception), where view is a read-only memoryview
+             of the loaded input, or None if loading the input failed.
+    """
+    if self.error is not None:
+      return None, self.error
+    if self.name is None:
+      return memoryview(b""), None
+    self._shm = shared_memory.SharedMemory(name=self.name)
+    self._view = self._shm.buf[:self.size].toreadonly()
+    return self._view, None
+
+  def detach(self):
+    """
+    Unmaps the shared memory block in the worker process.
+
+    If the plugin still holds references to the buffer (e.g. an array
+    created from it), the block is unmapped when they are released.
+    """
+    try:
+      if self._view is not None:
+        self._view.release()
+      if self._shm is not None:
+        self._shm.close()
+    except BufferError:
+      pass
+    self._view = None
+    self._shm = None
+
+  def release(self):
+    """
+    Removes the shared memory block in the main process.
+    """
+    if self._shm is not None:
+      self._shm.close()
+      self._shm.unlink()
+      self._shm = None
@@ -0,0 +1,179 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+import os
+import sys
+import struct
+import hashlib
+import heapq
+from array import array
+from bisect import bisect_left
+
+class SkipIndex():
+  """
+  A memory-compact set of IDs, used for skipping the computation
+  of units for which results were already computed.
+
+  Instead of the IDs themselves, 64-bit fingerprints (hashes) of the IDs
+  are stored in a sorted array, and membership is tested by binary search.
+  Thus, about 8 bytes per ID are used. The probability that an ID which is
+  not in the index is found by a test (false positive) is negligible
+  (about 1 in 10^6 for 10^7 indexed IDs).
+
+  The index of a skip list file can be saved to a sidecar file (named as
+  the skip list file, with the ``.idx`` suffix). The sidecar stores the
+  size of the portion of the skip list file which was indexed. When the
+  index is loaded from the sidecar (see ``from_file``), only the lines added
+  to the skip list file after that portion are read.
+
+  Attributes:
+    fingerprints (array): The sorted fingerprints of the indexed IDs.
+    added (array): The fingerprints of the IDs added using ``add``, which
+                   are not yet considered by membership tests.
+    indexed_size (int): The size of the portion of the skip list file
+                        which is indexed.
+  """
+
+  SIDECAR_SUFFIX = ".idx"
+  SIDECAR_MAGIC = b"PRNCSKIP"
+  SIDECAR_HEADER = struct.Struct("<8sQQ16s")
+  PREFIX_SIZE = 4096
+  SORT_CHUNK_SIZE = 1 << 20
+
+  @staticmethod
+  def fingerprint(element):
+    """
+    Computes the 64-bit fingerprint of an ID (str or bytes).
+    """
+    if isinstance(element, str):
+      element = element.encode()
+    return int.from_bytes(hashlib.blake2b(element, digest_size=8).digest(),
+                          "little")
+
+  @classmethod
+  def _sorted_array(cls, values):
+    chunks = [array("Q", sorted(values[i:i+cls.SORT_CHUNK_SIZE])) \
+                for i in range(0, len(values), cls.SORT_CHUNK_SIZE)]
+    return array("Q", heapq.merge(*chunks))
+
+  def __init__(self, fingerprints = None, indexed_size = 0):
+    self.fingerprints = fingerprints if fingerprints is not None \
+                          else array("Q")
+    self.added = array("Q")
+    self.indexed_size = indexed_size
+
+  def __len__(self):
+    return len(self.fingerprints) + len(self.added)
+
+  def __contains__(self, element):
+    fp = self.fingerprint(element)
+    i = bisect_left(self.fingerprints, fp)
+    return i < len(self.fingerprints) and self.fingerprints[i] == fp
+
+  def add(self, element):
+    """
+    Adds an ID to the index.
+
+    The added IDs are only considered by membership tests after
+    the index is saved to file (``save``) and loaded again.
+    """
+    self.added.append(self.fingerprint(element))
+
+  def _merge_added(self):
+    if self.added:
+      self.fingerprints = self._sorted_array(self.fingerprints + self.added)
+      self.added = array("Q")
+
+  @classmethod
+  def _prefix_digest(cls, filename, indexed_size):
+    with open(filename, "rb") as f:
+      prefix = f.read(min(cls.PREFIX_SIZE, indexed_size))
+    return hashlib.blake2b(prefix, digest_size=16).digest()
+
+  @classmethod
+  def _load_sidecar(cls, filename):
+    sidecar = filename + cls.SIDECAR_SUFFIX
+    try:
+      with open(sidecar, "rb") as f:
+        magic, indexed_size, n_fingerprints, prefix_digest = \
+            cls.SIDECAR_HEADER.unpack(f.read(cls.SIDECAR_HEADER.size))
+        if magic != cls.SIDECAR_MAGIC or \
+            indexed_size > os.path.getsize(filename) or \
+            prefix_digest != cls._prefix_digest(filename, indexed_size):
+          return None
+        fingerprints = array("Q")
+        fingerprints.fromfile(f, n_fingerprints)
+    except (OSError, EOFError, struct.error):
+      return None
+    if sys.byteorder == "big":
+      fingerprints.byteswap()
+    return cls(fingerprints, indexed_size)
+
+  def _index_lines(self, filename):
+    new_fingerprints = array("Q")
+    with open(filename, "rb") as f:
+      f.seek(self.indexed_size)
+      for line in f:
+        element = line.rstrip(b"\r\n").split(b"\t")[0]
+        if element:
+          new_fingerprints.append(self.fingerprint(element))
+        if line.endswith(b"\n"):
+          self.indexed_size += len(line)
+    if new_fingerprints:
+      self.fingerprints = \
+          self._sorted_array(self.fingerprints + new_fingerprints)
+    return len(new_fingerprints)
+
+  @classmethod
+  def from_file(cls, filename, use_sidecar = True):
+    """
+    Creates the index of a skip list file.
+
+    The skip list file can contain one ID per line, or be a tab-separated
+    file with the ID in the first column.
+
+    If ``use_sidecar`` is set, the index is loaded from the sidecar file,
+    if it exists and is consistent with the skip list file; the lines
+    added to the skip list file since the sidecar was saved are indexed
+    and, if there are any, the sidecar file is updated.
+    """
+    index = cls._load_sidecar(filename) if use_sidecar else None
+    if index is None:
+      index = cls()
+    n_new = index._index_lines(filename)
+    if use_sidecar and (n_new > 0 or \
+        not os.path.exists(filename + cls.SIDECAR_SUFFIX)):
+      index.save(filename)
+    return index
+
+  def save(self, filename, indexed_size = None):
+    """
+    Saves the index to the sidecar file of the skip list file ``filename``.
+
+    If ``indexed_size`` is provided, the index is assumed to cover the
+    skip list file up to that size (e.g. because the IDs written to the file
+    were added to the index using ``add``).
+
+    Errors writing the sidecar file (e.g. if the directory is not writable)
+    are ignored, as the sidecar is only a cache.
+    """
+    self._merge_added()
+    if indexed_size is not None:
+      self.indexed_size = indexed_size
+    sidecar = filename + self.SIDECAR_SUFFIX
+    tmpname = f"{sidecar}.{os.getpid()}.tmp"
+    fingerprints = self.fingerprints
+    if sys.byteorder == "big":
+      fingerprints = array("Q", fingerprints)
+      fingerprints.byteswap()
+    try:
+      with open(tmpname, "wb") as f:
+        f.write(self.SIDECAR_HEADER.pack(self.SIDECAR_MAGIC,
+                  self.indexed_size, len(fingerprints),
+                  self._prefix_digest(filename, self.indexed_size)))
+        fingerprints.tofile(f)
+      os.replace(tmpname, sidecar)
+    except OSError:
+      if os.path.exists(tmpname):
+        os.unlink(tmpname)
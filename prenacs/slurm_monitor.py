@@ -0,0 +1,139 @@
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+import os
+import time
+import sh
+
+class SlurmArrayMonitor():
+  """
+  Monitors the tasks of a Slurm job array, submitted with
+  ``prenacs array-task`` as command.
+
+  Each array task writes its output to a temporary file in the output
+  directory and renames it to the task ID when complete; thus the
+  presence of a file named as the task ID is the completion marker of
+  the task. The progress of the array is tracked by scanning the output
+  directory, without querying the Slurm controller.
+
+  The queue (``squeue``) is only checked if no task was completed for
+  ``queue_check_interval`` seconds, to detect when the job array has
+  left the queue although some tasks did not complete (e.g. failed,
+  timed out or were cancelled). The accounting database (``sacct``) is only
+  queried for the state of these tasks (see ``failed_tasks``).
+
+  Attributes:
+    job_id (int): The Slurm job ID of the array.
+    n_tasks (int): The number of tasks of the array.
+    outdir (str): The output directory of the tasks.
+    completed (set): The IDs of the completed tasks.
+  """
+
+  SCAN_INTERVAL = 2
+  QUEUE_CHECK_INTERVAL = 60
+
+  def __init__(self, job_id, n_tasks, outdir,
+               scan_interval = None, queue_check_interval = None):
+    self.job_id = job_id
+    self.n_tasks = n_tasks
+    self.outdir = outdir
+    self.scan_interval = scan_interval or self.SCAN_INTERVAL
+    self.queue_check_interval = queue_check_interval or \
+        self.QUEUE_CHECK_INTERVAL
+    self.completed = set()
+
+  def scan(self):
+    """
+    Scans the output directory for completion markers.
+
+    Returns:
+      list: The IDs of the tasks completed since the last scan.
+    """
+    newly_completed = []
+    try:
+      entries = list(os.scandir(self.outdir))
+    except FileNotFoundError:
+      return newly_completed
+    for entry in entries:
+      if entry.name.isdigit():
+        task_id = int(entry.name)
+        if task_id < self.n_tasks and task_id not in self.completed:
+          self.completed.add(task_id)
+          newly_completed.append(task_id)
+    return sorted(newly_completed)
+
+  def in_queue(self):
+    """
+    Checks if any task of the job array is pending or running.
+
+    If the queue cannot be queried, the job is assumed to be still
+    in the queue, unless Slurm reports that the job ID is unknown.
+    """
+    try:
+      out = sh.squeue("--noheader", "--jobs", str(self.job_id),
+                      "--format", "%i")
+    except sh.ErrorReturnCode as exc:
+      return b"Invalid job id" not in exc.stderr
+    return bool(str(out).strip())
+
+  def completed_tasks(self):
+    """
+    Yields the ID of each task, as soon as its completion marker is found,
+    until all tasks are complete or the job array has left the queue.
+    """
+    last_progress = time.monotonic()
+    while len(self.completed) < self.n_tasks:
+      newly_completed = self.scan()
+      yield from newly_completed
+      now = time.monotonic()
+      if newly_completed:
+        last_progress = now
+      elif now - last_progress >= self.queue_check_interval:
+        if not self.in_queue():
+          # the markers may be written just before the tasks leave the queue
+          yield from self.scan()
+          return
+        last_progress = now
+      if len(self.completed) < self.n_tasks:
+        time.sleep(self.scan_interval)
+
+  @property
+  def missing(self):
+    """
+    The IDs of the tasks without completion marker.
+    """
+    return sorted(set(range(self.n_tasks)) - self.completed)
+
+  def failed_tasks(self):
+    """
+    Retrieves from the accounting database the state of the tasks,
+    which did not complete.
+
+    Returns:
+      dict: The task IDs by state (e.g. FAILED, TIMEOUT, CANCELLED);
+            tasks whose state cannot be retrieved have the state UNKNOWN.
+    """
+    missing = self.missing
+    if not missing:
+      return {}
+    states = {}
+    try:
+      out = str(sh.sacct("--noheader", "-X", "--jobs", str(self.job_id),
+                         "--format", "jobid%30,state%20"))
+    except sh.ErrorReturnCode:
+      out = ""
+    known = set()
+    missing_set = set(missing)
+    for line in out.splitlines():
+      fields = line.split()
+      if len(fields) < 2:
+        continue
+      task = fields[0].split(f"{self.job_id}_")[-1]
+      if task.isdigit() and int(task) in missing_set:
+        states.setdefault(fields[1], []).append(int(task))
+        known.add(int(task))
+    unknown = [task_id for task_id in missing if task_id not in known]
+    if unknown:
+      states["UNKNOWN"] = unknown
+    return states
@@ -23,8 +23,11 @@ PLUGIN_FILE=$1
 PARAMETERS_FILE=$2
 INPUT_LIST_FILE=$3
 OUTPUT_DIR=$4
+UNITS_PER_TASK=${5:-1}
+TASK_PROCESSES=${6:-1}
 
-prenacs-array-task \
+prenacs array-task \
+  --units-per-task $UNITS_PER_TASK --processes $TASK_PROCESSES \
   $PLUGIN_FILE $PARAMETERS_FILE \
   $INPUT_LIST_FILE $SLURM_ARRAY_TASK_ID \
-  $OUTPUT_DIR
\ No newline at end of file
+  $OUTPUT_DIR
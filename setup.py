@@ -27,6 +27,9 @@ setup(name='prenacs',
         "multiplug==1.2",
         "snacli==1.2",
       ],
+      extras_require={
+        "columnar": ["pyarrow"],
+      },
       url='https://github.com/ggonnella/prenacs',
       keywords="batch computing, database, data provenance",
       author='Giorgio Gonnella',
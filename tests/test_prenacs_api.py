@@ -2,16 +2,30 @@
 # (c) 2021-2022 Giorgio Gonnella, University of Goettingen, Germany
 #
 
+import pytest
 import yaml
 from attrtables import AttributeValueTables
 from prenacs import AttributeDefinition, AttributeDefinitionsManager,\
                       ResultsLoader, BatchComputation
-from helper import PFXAVT, ECHO, TESTDATA, check_attributes, \
+from prenacs.skip_index import SkipIndex
+from prenacs.results_cache import ResultsCache
+from prenacs.input_buffer import mapped_input, decompressed_path, count
+from prenacs.columnar_results import results_format_of, columnar_to_tsv
+from prenacs.error import PrenacsError
+from prenacs.input_list import IndexedInputList
+from prenacs.slurm_monitor import SlurmArrayMonitor
+from prenacs.commands import array_task
+from helper import PFXAVT, ECHO, TESTDATA, BIN, check_attributes, \
                    check_values_after_run, check_no_attributes, \
                    check_results, check_file_content, check_empty_file, \
                    check_report
 import tempfile
+import time
+import shutil
+import gzip
 import os
+import dill
+import docopt
 from contextlib import contextmanager
 
 def test_prenacs_api_database(connection):
@@ -107,3 +121,689 @@ def test_prenacs_api_batch_computing_ids_with_proc():
                    reason="new_attributes")
       check_results(outfilename, str(TESTDATA/"wc_expected.tsv"))
       check_empty_file(logfilename)
+
+def test_prenacs_api_batch_computing_chunked():
+  for chunk_size, max_inflight in [(1, 1), (2, 3), (4, None), (20, None)]:
+    bc = BatchComputation(str(TESTDATA/"wc_from_id_plugin.sh"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_parallel_params(chunk_size=chunk_size, max_inflight=max_inflight)
+    params = {"testdatadir": str(TESTDATA)}
+    with outfiles(bc, params=params) as \
+        (outfilename, logfilename, reportfilename):
+      bc.run(mode="parallel", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "wc", "1.0", 9, "completed", params=params)
+      check_results(outfilename, str(TESTDATA/"wc_expected.tsv"))
+      check_empty_file(logfilename)
+
+def test_prenacs_api_batch_computing_with_state():
+  for chunk_size in [1, 4]:
+    bc = BatchComputation(str(TESTDATA/"echo_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_parallel_params(chunk_size=chunk_size)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="parallel", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "echo", "1.0", 9, "completed")
+      with open(outfilename) as f:
+        lines = sorted(f.readlines())
+      assert(lines == [f"{n}\t{n}\n" for n in range(1, 10)])
+
+def test_prenacs_api_batch_computing_per_worker_init():
+  with tempfile.TemporaryDirectory() as statedir:
+    bc = BatchComputation(str(TESTDATA/"worker_state_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_parallel_params(chunk_size=2, per_worker_init=True)
+    params = {"state": {"outdir": statedir}}
+    with outfiles(bc, params=params) as \
+        (outfilename, logfilename, reportfilename):
+      bc.run(mode="parallel", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "worker_state", "1.0", 9, "completed",
+                   params=params)
+      with open(outfilename) as f:
+        pids = {line.rstrip().split("\t")[1] for line in f}
+    assert(str(os.getpid()) not in pids)
+    assert(pids <= set(os.listdir(statedir)))
+    n_units = 0
+    for pid in os.listdir(statedir):
+      with open(os.path.join(statedir, pid)) as f:
+        n_units += int(f.read())
+    assert(n_units == 9)
+
+def computed_ids(outfilename):
+  with open(outfilename) as f:
+    return sorted(line.split("\t")[0] for line in f)
+
+def test_prenacs_api_batch_computing_lazy_input():
+  with tempfile.TemporaryDirectory() as tmpdir:
+    idsfilename = os.path.join(tmpdir, "ids.txt")
+    with open(idsfilename, "w") as f:
+      f.write("5\n1\n")
+    bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+    bc.input_from_idsfile(idsfilename, verbose=ECHO)
+    # the IDs file is only read while the computation runs
+    with open(idsfilename, "a") as f:
+      f.write("9\n3\n")
+    assert(not isinstance(bc.all_ids, list))
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="serial", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "failing", "1.0", 4, "completed")
+      with open(outfilename) as f:
+        assert([line.split("\t")[0] for line in f] == ["5", "1", "9", "3"])
+    # the glob pattern is only expanded while the computation runs
+    datadir = os.path.join(tmpdir, "data")
+    os.mkdir(datadir)
+    bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.sh"))
+    bc.input_from_globpattern(os.path.join(datadir, "*.data"),
+                              verbose=ECHO)
+    for n in [1, 2]:
+      shutil.copy(TESTDATA/f"input{n}.data", datadir)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="serial", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "wc", "1.0", 2, "completed")
+    # empty input
+    open(idsfilename, "w").close()
+    for mode in ["serial", "parallel"]:
+      bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+      bc.input_from_idsfile(idsfilename, verbose=ECHO)
+      with outfiles(bc) as (outfilename, logfilename, reportfilename):
+        bc.run(mode=mode, verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "failing", "1.0", 0, "completed")
+        assert(computed_ids(outfilename) == [])
+
+def test_prenacs_api_batch_computing_skip_index():
+  params = {"testdatadir": str(TESTDATA)}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    skipfilename = os.path.join(tmpdir, "skip.tsv")
+    outfilename = os.path.join(tmpdir, "out.tsv")
+    with open(skipfilename, "w") as f:
+      f.write("1\tx\n2\tx\n3\tx\n4\tx\n")
+
+    def run(skip, outfilename):
+      bc = BatchComputation(str(TESTDATA/"wc_from_id_plugin.sh"))
+      bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), skip=skip, verbose=ECHO)
+      bc.set_output(outfilename, os.path.join(tmpdir, "log.tsv"))
+      bc.setup_computation(params=params,
+                           reportfile=open(os.path.join(tmpdir, "r"), "w"))
+      bc.run(mode="serial", verbose=ECHO)
+      bc.finalize()
+      assert(os.path.exists(skip+".idx"))
+    run(skipfilename, outfilename)
+    assert(computed_ids(outfilename) == ["5", "6", "7", "8", "9"])
+    with open(skipfilename, "a") as f:
+      f.write("5\tx\n6\tx\n7\tx\n8\tx\n9")
+    run(skipfilename, os.path.join(tmpdir, "out2.tsv"))
+    assert(computed_ids(os.path.join(tmpdir, "out2.tsv")) == [])
+    run(outfilename, outfilename)
+    assert(computed_ids(outfilename) == [str(n) for n in range(1, 10)])
+    index = SkipIndex.from_file(outfilename)
+    assert(index.indexed_size == os.path.getsize(outfilename))
+    assert(all(str(n) in index for n in range(1, 10)))
+    assert("10" not in index)
+
+def test_prenacs_api_batch_computing_buffered_writer():
+  for background in [False, True]:
+    bc = BatchComputation(str(TESTDATA/"wc_from_id_plugin.sh"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), 2, verbose=ECHO)
+    params = {"testdatadir": str(TESTDATA)}
+    with outfiles(bc, params=params) as \
+        (outfilename, logfilename, reportfilename):
+      bc.set_output(outfilename, logfilename, buffer_size=20,
+                    fsync_interval=0.01, fsync_every=2,
+                    background_writer=background)
+      bc.run(mode="serial", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "wc", "1.0", 9, "completed", params=params)
+      check_results(outfilename, str(TESTDATA/"wc_expected_wo_9.tsv"))
+      check_file_content(logfilename,
+          f"0\t{TESTDATA}/input0.data does not exist\n")
+
+def test_prenacs_api_batch_computing_columnar_output():
+  pytest.importorskip("pyarrow")
+  definitions = {a: {"datatype": "Integer"} for a in ["lines", "words", "bytes"]}
+  params = {"testdatadir": str(TESTDATA)}
+  for results_format in ["arrow", "parquet"]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+      outfilename = os.path.join(tmpdir, f"out.{results_format}")
+      tsvfilename = os.path.join(tmpdir, "out.tsv")
+      bc = BatchComputation(str(TESTDATA/"wc_from_id_plugin.sh"))
+      bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), 2, verbose=ECHO)
+      bc.set_output(outfilename, os.path.join(tmpdir, "log.tsv"),
+                    results_format=results_format, definitions=definitions)
+      bc.setup_computation(params=params,
+                           reportfile=open(os.path.join(tmpdir, "r"), "w"))
+      bc.run(mode="parallel", verbose=ECHO)
+      bc.finalize()
+      assert(results_format_of(outfilename) == results_format)
+      with open(tsvfilename, "w") as f:
+        columnar_to_tsv(outfilename, f)
+      check_results(tsvfilename, str(TESTDATA/"wc_expected_wo_9.tsv"))
+
+def test_prenacs_api_batch_computing_compute_batch():
+  for mode, chunk_size in [("serial", None), ("serial", 4),
+                           ("parallel", None), ("parallel", 4)]:
+    bc = BatchComputation(str(TESTDATA/"batch_echo_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_parallel_params(chunk_size=chunk_size)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode=mode, verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "batch_echo", "1.0", 9, "completed")
+      with open(outfilename) as f:
+        rows = sorted(line.rstrip("\n").split("\t") for line in f)
+      assert([row[:2] for row in rows] == [[str(n)]*2 for n in range(1, 10)])
+      expected_max = chunk_size or 9
+      assert(max(int(row[2]) for row in rows) == expected_max)
+
+def test_prenacs_api_batch_computing_async():
+  for concurrency in [1, 3, None]:
+    bc = BatchComputation(str(TESTDATA/"async_echo_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_async_params(concurrency=concurrency)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="async", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "async_echo", "1.0", 9, "completed")
+      with open(outfilename) as f:
+        lines = sorted(f.readlines())
+      assert(lines == [f"{n}\t{n}\n" for n in range(1, 10)])
+    assert(bc.plugin.max_active == (concurrency or 9))
+  bc = BatchComputation(str(TESTDATA/"wc_from_id_plugin.sh"))
+  bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), 2, verbose=ECHO)
+  params = {"testdatadir": str(TESTDATA)}
+  with outfiles(bc, params=params) as \
+      (outfilename, logfilename, reportfilename):
+    bc.run(mode="async", verbose=ECHO)
+    bc.finalize()
+    check_report(reportfilename, "wc", "1.0", 9, "completed", params=params)
+    check_results(outfilename, str(TESTDATA/"wc_expected_wo_9.tsv"))
+  bc = BatchComputation(str(TESTDATA/"batch_echo_plugin.py"))
+  bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+  bc.set_parallel_params(chunk_size=4)
+  with outfiles(bc) as (outfilename, logfilename, reportfilename):
+    bc.run(mode="async", verbose=ECHO)
+    bc.finalize()
+    with open(outfilename) as f:
+      rows = sorted(line.rstrip("\n").split("\t") for line in f)
+    assert([row[0] for row in rows] == [str(n) for n in range(1, 10)])
+    assert(max(int(row[2]) for row in rows) == 4)
+
+def test_prenacs_api_batch_computing_threads():
+  for n_threads, chunk_size in [(1, None), (3, 2), (None, None)]:
+    bc = BatchComputation(str(TESTDATA/"wc_from_id_plugin.sh"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), 2, verbose=ECHO)
+    bc.set_parallel_params(chunk_size=chunk_size)
+    bc.set_threads_params(n_threads=n_threads)
+    params = {"testdatadir": str(TESTDATA)}
+    with outfiles(bc, params=params) as \
+        (outfilename, logfilename, reportfilename):
+      bc.run(mode="threads", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "wc", "1.0", 9, "completed", params=params)
+      check_results(outfilename, str(TESTDATA/"wc_expected_wo_9.tsv"))
+  bc = BatchComputation(str(TESTDATA/"batch_echo_plugin.py"))
+  bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+  bc.set_parallel_params(chunk_size=4)
+  with outfiles(bc) as (outfilename, logfilename, reportfilename):
+    bc.run(mode="threads", verbose=ECHO)
+    bc.finalize()
+    assert(computed_ids(outfilename) == [str(n) for n in range(1, 10)])
+
+def test_prenacs_api_batch_computing_continue_on_error():
+  for mode in ["serial", "parallel", "threads", "async"]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+      failuresfilename = os.path.join(tmpdir, "failures.tsv")
+      bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+      bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+      bc.set_parallel_params(chunk_size=2)
+      bc.set_failure_params(continue_on_error=True,
+                            failuresfilename=failuresfilename)
+      with outfiles(bc) as (outfilename, logfilename, reportfilename):
+        bc.run(mode=mode, verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "failing", "1.0", 5, "partial")
+        with open(reportfilename) as f:
+          remarks = yaml.safe_load(yaml.safe_load(f)["remarks"])
+        assert(remarks == {"n_failed_units": 4})
+        assert(computed_ids(outfilename) == ["1", "3", "5", "7", "9"])
+      with open(failuresfilename) as f:
+        failures = sorted(line.rstrip("\n").split("\t") for line in f)
+      assert([row[:4] for row in failures] == \
+          [[n, n, "ValueError", f"even unit:\\t{n}"] for n in "2468"])
+      assert(all("\\n" in row[4] and "failing_plugin" in row[4]
+                 for row in failures))
+  bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+  bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+  with outfiles(bc) as (outfilename, logfilename, reportfilename):
+    with pytest.raises(ValueError):
+      bc.run(mode="serial", verbose=ECHO)
+    check_report(reportfilename, "failing", "1.0", 1, "partial")
+
+def test_prenacs_api_batch_computing_unit_timeout():
+  for chunk_size in [1, 3]:
+    with tempfile.TemporaryDirectory() as tmpdir:
+      failuresfilename = os.path.join(tmpdir, "failures.tsv")
+      bc = BatchComputation(str(TESTDATA/"hanging_plugin.py"))
+      bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+      bc.set_parallel_params(chunk_size=chunk_size, unit_timeout=0.5)
+      bc.set_failure_params(continue_on_error=True,
+                            failuresfilename=failuresfilename)
+      with outfiles(bc) as (outfilename, logfilename, reportfilename):
+        bc.run(mode="parallel", verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "hanging", "1.0", 6, "partial")
+        assert(computed_ids(outfilename) == ["1", "2", "4", "6", "8", "9"])
+      with open(failuresfilename) as f:
+        failures = sorted(line.split("\t")[:3] for line in f)
+      assert(failures == [["3", "3", "UnitTimeoutError"],
+                          ["5", "5", "WorkerCrashError"],
+                          ["7", "7", "UnitTimeoutError"]])
+  # timeouts and crashes do not stop the computation
+  with tempfile.TemporaryDirectory() as tmpdir:
+    failuresfilename = os.path.join(tmpdir, "failures.tsv")
+    bc = BatchComputation(str(TESTDATA/"hanging_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_parallel_params(unit_timeout=0.5)
+    bc.set_failure_params(failuresfilename=failuresfilename)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="parallel", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "hanging", "1.0", 6, "partial")
+      check_n_failed_units(reportfilename, 3)
+    with open(failuresfilename) as f:
+      assert(sorted(line.split("\t")[0] for line in f) == ["3", "5", "7"])
+
+def test_prenacs_api_batch_computing_abort_with_hung_worker():
+  bc = BatchComputation(str(TESTDATA/"stuck_plugin.py"))
+  bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+  bc.set_parallel_params(chunk_size=1, unit_timeout=20)
+  with outfiles(bc) as (outfilename, logfilename, reportfilename):
+    start = time.monotonic()
+    with pytest.raises(ValueError):
+      bc.run(mode="parallel", verbose=ECHO)
+    # the hung worker is killed, instead of waiting for it
+    assert(time.monotonic() - start < 15)
+    with open(reportfilename) as f:
+      report = yaml.safe_load(f)
+    assert(yaml.safe_load(report["remarks"])["error_class"] == "ValueError")
+
+def test_prenacs_api_batch_computing_loader_timeout():
+  with tempfile.TemporaryDirectory() as tmpdir:
+    failuresfilename = os.path.join(tmpdir, "failures.tsv")
+    bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.sh"))
+    bc.input_from_globpattern(str(TESTDATA/"*.data"), verbose=ECHO)
+    bc.set_parallel_params(chunk_size=3, unit_timeout=0.5)
+    bc.set_input_loader(str(TESTDATA/"slow_input_loader.py"))
+    fused = BatchComputation(str(TESTDATA/"shared_wc_plugin.py"))
+    fused.set_failure_params(continue_on_error=True,
+                             failuresfilename=failuresfilename)
+    with outfiles(fused) as (f_outfilename, f_logfilename, f_reportfilename):
+      bc.set_fused([fused])
+      with outfiles(bc) as (outfilename, logfilename, reportfilename):
+        bc.run(mode="parallel", verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "wc", "1.0", 9, "completed")
+      check_report(f_reportfilename, "shared_wc", "1.0", 8, "partial")
+    with open(failuresfilename) as f:
+      failures = [line.split("\t") for line in f]
+    assert(len(failures) == 1)
+    assert(failures[0][0].endswith("input3.data"))
+    assert(failures[0][2] == "UnitTimeoutError")
+
+def test_prenacs_api_batch_computing_worker_recycling():
+  for max_tasks, max_rss, max_units in [(2, None, 2), (None, 1, 1)]:
+    with tempfile.TemporaryDirectory() as statedir:
+      bc = BatchComputation(str(TESTDATA/"worker_state_plugin.py"))
+      bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+      bc.set_parallel_params(max_inflight=1, per_worker_init=True,
+                             max_tasks_per_worker=max_tasks,
+                             max_worker_rss=max_rss)
+      params = {"state": {"outdir": statedir}}
+      with outfiles(bc, params=params) as \
+          (outfilename, logfilename, reportfilename):
+        bc.run(mode="parallel", verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "worker_state", "1.0", 9, "completed",
+                     params=params)
+      n_units = []
+      for pid in os.listdir(statedir):
+        with open(os.path.join(statedir, pid)) as f:
+          n_units.append(int(f.read()))
+      assert(sum(n_units) == 9)
+      assert(max(n_units) <= max_units)
+
+def test_prenacs_api_batch_computing_schedule():
+  bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.py"))
+  bc.input_from_globpattern(str(TESTDATA/"*.data"), verbose=ECHO,
+                            idsproc_module=str(TESTDATA/"echo_plugin.py"))
+  bc.set_schedule("size")
+  with outfiles(bc) as (outfilename, logfilename, reportfilename):
+    bc.run(mode="serial", verbose=ECHO)
+    bc.finalize()
+    with open(outfilename) as f:
+      ids = [line.split("\t")[0] for line in f]
+    assert(ids == [f"input{n}" for n in range(9, 0, -1)])
+  bc = BatchComputation(str(TESTDATA/"cost_echo_plugin.py"))
+  bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+  bc.set_schedule("cost")
+  with outfiles(bc) as (outfilename, logfilename, reportfilename):
+    bc.run(mode="serial", verbose=ECHO)
+    bc.finalize()
+    with open(outfilename) as f:
+      ids = [line.split("\t")[0] for line in f]
+    assert(ids == [str(n) for n in range(9, 0, -1)])
+  bc = BatchComputation(str(TESTDATA/"echo_plugin.py"))
+  with pytest.raises(PrenacsError):
+    bc.set_schedule("cost")
+
+def test_prenacs_api_batch_computing_results_cache():
+  with tempfile.TemporaryDirectory() as tmpdir:
+    cachedir = os.path.join(tmpdir, "cache")
+    statedir = os.path.join(tmpdir, "state")
+    os.mkdir(statedir)
+
+    def run(mode, max_size=None, state=None, **params):
+      bc = BatchComputation(str(TESTDATA/"worker_state_plugin.py"))
+      bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+      bc.set_cache(cachedir, max_size=max_size)
+      params = {"state": {"outdir": statedir, **(state or {})}, **params}
+      with outfiles(bc, params=params) as \
+          (outfilename, logfilename, reportfilename):
+        bc.run(mode=mode, verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "worker_state", "1.0", 9, "completed",
+                     params=params)
+        assert(computed_ids(outfilename) == [str(n) for n in range(1, 10)])
+      countfilename = os.path.join(statedir, str(os.getpid()))
+      with open(countfilename) as f:
+        n_computed = int(f.read())
+      os.unlink(countfilename)
+      return n_computed
+    assert(run("serial") == 9)
+    assert(run("parallel") == 0)
+    assert(run("serial", x=1) == 9)
+    assert(run("serial", x=1) == 0)
+    assert(run("serial", state={"threshold": 1}) == 9)
+    assert(run("serial", state={"threshold": 1}) == 0)
+    assert(run("serial", state={"threshold": 2}) == 9)
+    cache = ResultsCache(cachedir)
+    assert(cache._total_size() > 0)
+    max_size = cache._total_size() // 4
+    assert(run("serial", max_size, x=2) == 9)
+    assert(cache._total_size() <= max_size)
+
+def test_prenacs_api_batch_computing_incremental():
+  with tempfile.TemporaryDirectory() as tmpdir:
+    outfilename = os.path.join(tmpdir, "out.tsv")
+
+    def write_input(n, content):
+      filename = os.path.join(tmpdir, f"{n}.data")
+      with open(filename, "w") as f:
+        f.write(content)
+      os.utime(filename, ns=(n * 10**9, n * 10**9))
+
+    def run():
+      bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.sh"))
+      bc.input_from_globpattern(os.path.join(tmpdir, "*.data"),
+                                idsproc_module=str(TESTDATA/"echo_plugin.py"),
+                                verbose=ECHO)
+      bc.set_output(outfilename, os.path.join(tmpdir, "log.tsv"))
+      bc.set_incremental()
+      reportfilename = os.path.join(tmpdir, "r")
+      bc.setup_computation(reportfile=open(reportfilename, "w"))
+      bc.run(mode="serial", verbose=ECHO)
+      bc.finalize()
+      with open(reportfilename) as f:
+        return yaml.safe_load(f)["n_units"]
+    for n in range(1, 5):
+      write_input(n, "a\n")
+    assert(run() == 4)
+    assert(run() == 0)
+    write_input(2, "a b\nc\n")
+    write_input(5, "a\n")
+    assert(run() == 2)
+    with open(outfilename) as f:
+      rows = sorted(line.rstrip("\n").split("\t") for line in f)
+    assert(rows == [["1", "1", "1", "2"], ["2", "2", "3", "6"],
+                    ["3", "1", "1", "2"], ["4", "1", "1", "2"],
+                    ["5", "1", "1", "2"]])
+    with pytest.raises(PrenacsError):
+      bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.sh"))
+      bc.set_incremental()
+
+def test_prenacs_api_batch_computing_fused():
+  for mode, preload, timeout in [("serial", False, None),
+                                 ("parallel", False, None),
+                                 ("threads", False, None),
+                                 ("threads", False, 5),
+                                 ("parallel", True, None)]:
+    bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.sh"))
+    bc.input_from_globpattern(str(TESTDATA/"*.data"), verbose=ECHO)
+    bc.set_parallel_params(unit_timeout=timeout)
+    fused = BatchComputation(str(TESTDATA/"shared_wc_plugin.py"))
+    bc.set_input_loader(str(TESTDATA/"text_input_loader.py"),
+                        preload=preload)
+    with outfiles(fused) as (f_outfilename, f_logfilename, f_reportfilename):
+      bc.set_fused([fused])
+      with outfiles(bc) as (outfilename, logfilename, reportfilename):
+        bc.run(mode=mode, verbose=ECHO)
+        bc.finalize()
+        check_report(reportfilename, "wc", "1.0", 9, "completed")
+        check_results(outfilename,
+                      str(TESTDATA/"wc_expected_wfilename.tsv"),
+                      basename=True)
+      check_report(f_reportfilename, "shared_wc", "1.0", 9, "completed")
+      check_results(f_outfilename, str(TESTDATA/"wc_expected_wfilename.tsv"),
+                    basename=True)
+  bc = BatchComputation(str(TESTDATA/"wc_from_filename_plugin.sh"))
+  bc.input_from_globpattern(str(TESTDATA/"*.data"), verbose=ECHO)
+  bc.set_fused([BatchComputation(str(TESTDATA/"shared_wc_plugin.py"))])
+  with pytest.raises(PrenacsError):
+    bc.run(mode="serial", verbose=ECHO)
+
+def test_prenacs_api_mapped_input():
+  with tempfile.TemporaryDirectory() as tmpdir:
+    cachedir = os.path.join(tmpdir, "cache")
+    for n in range(1, 10):
+      with open(TESTDATA/f"input{n}.data", "rb") as src, \
+          gzip.open(os.path.join(tmpdir, f"input{n}.data.gz"), "wb") as dst:
+        dst.write(src.read())
+    expected = []
+    with open(TESTDATA/"wc_expected_wfilename.tsv") as f:
+      for line in f:
+        filename, n_lines, n_words, n_bytes = line.rstrip("\n").split("\t")
+        expected.append(f"{filename[:-len('.data')]}\t{n_lines}\t{n_bytes}")
+    expected.sort()
+    for pattern in [str(TESTDATA/"*.data"), os.path.join(tmpdir, "*.gz")]:
+      bc = BatchComputation(str(TESTDATA/"mapped_wc_plugin.py"))
+      bc.input_from_globpattern(pattern,
+          idsproc_module=str(TESTDATA/"echo_plugin.py"), verbose=ECHO)
+      with outfiles(bc, params={"cachedir": cachedir}) as \
+          (outfilename, logfilename, reportfilename):
+        bc.run(mode="parallel", verbose=ECHO)
+        bc.finalize()
+        with open(outfilename) as f:
+          assert(sorted(line.replace(".data", "").rstrip("\n") \
+                          for line in f) == expected)
+    assert(len(os.listdir(cachedir)) == 9)
+    gzfilename = os.path.join(tmpdir, "input1.data.gz")
+    path = decompressed_path(gzfilename, cachedir)
+    inode = os.stat(path).st_ino
+    assert(decompressed_path(gzfilename, cachedir) == path)
+    assert(os.stat(path).st_ino == inode)
+    # least recently used decompressed files are removed first
+    paths = {}
+    for n in range(2, 10):
+      paths[n] = decompressed_path(
+          os.path.join(tmpdir, f"input{n}.data.gz"), cachedir)
+      os.utime(paths[n], (n, n))
+    max_size = sum(os.path.getsize(os.path.join(cachedir, name)) \
+                     for name in os.listdir(cachedir))
+    newfilename = os.path.join(tmpdir, "new.data.gz")
+    with open(gzfilename, "rb") as src, open(newfilename, "wb") as dst:
+      dst.write(src.read())
+    newpath = decompressed_path(newfilename, cachedir, max_size=max_size)
+    assert(os.path.exists(newpath) and os.path.exists(path))
+    assert(not os.path.exists(paths[2]))
+    assert(os.path.exists(paths[9]))
+    assert(sum(os.path.getsize(os.path.join(cachedir, name)) \
+                 for name in os.listdir(cachedir)) <= max_size * 0.9)
+    with mapped_input(gzfilename, decompress=False) as data:
+      assert(data[:2] == b"\x1f\x8b")
+    empty = os.path.join(tmpdir, "empty")
+    open(empty, "w").close()
+    with mapped_input(empty) as data:
+      assert(count(data, b"\n") == 0)
+    with mapped_input(gzfilename, cachedir=cachedir) as data:
+      assert(count(data, b"\n") == 1)
+      assert(count(data, data[:2]) == 1)
+
+def test_prenacs_api_array_task():
+  with tempfile.TemporaryDirectory() as tmpdir:
+    params_f = os.path.join(tmpdir, "params")
+    input_list_f = os.path.join(tmpdir, "input_list")
+    with open(params_f, "wb") as f:
+      dill.dump({}, f)
+    with open(input_list_f, "wb") as f:
+      IndexedInputList.write(f, [str(n) for n in range(1, 8)])
+    with IndexedInputList(input_list_f) as input_list:
+      assert(len(input_list) == 7)
+      assert(input_list.slice(5, 10) == ["6", "7"])
+      assert(input_list.slice(8, 10) == [])
+    for task_id, processes, expected in [("1", "1", ["4", "5", "6"]),
+                                         ("2", "2", ["7"]),
+                                         ("0", "2", ["1", "2", "3"])]:
+      outdir = os.path.join(tmpdir, f"out{processes}")
+      array_task.main(docopt.docopt(array_task.__doc__,
+          argv=["array-task", "--units-per-task", "3",
+                "--processes", processes, str(TESTDATA/"failing_plugin.py"),
+                params_f, input_list_f, task_id, outdir]))
+      with open(os.path.join(outdir, task_id), "rb") as f:
+        outcomes = dill.load(f)
+      assert(len(outcomes) == len(expected))
+      for unit, (output, exc) in zip(expected, outcomes):
+        if int(unit) % 2 == 0:
+          assert(output is None and isinstance(exc, ValueError))
+        else:
+          assert(output[0] == [unit] and exc is None)
+
+def check_n_failed_units(reportfilename, n_failed_units):
+  with open(reportfilename) as f:
+    remarks = yaml.safe_load(yaml.safe_load(f)["remarks"])
+  assert(remarks == {"n_failed_units": n_failed_units})
+
+def use_fake_slurm(monkeypatch, tmpdir, failing_tasks):
+  fake_slurm = TESTDATA/"fake_slurm"
+  monkeypatch.chdir(tmpdir)
+  monkeypatch.setenv("PATH", f"{fake_slurm}:{os.environ['PATH']}")
+  monkeypatch.setenv("PRENACS", str(BIN/"prenacs"))
+  monkeypatch.setenv("FAKE_SLURM_DIR", os.path.join(tmpdir, "jobs"))
+  monkeypatch.setenv("FAKE_SLURM_FAIL", failing_tasks)
+  monkeypatch.setattr(SlurmArrayMonitor, "SCAN_INTERVAL", 0.1)
+  monkeypatch.setattr(SlurmArrayMonitor, "QUEUE_CHECK_INTERVAL", 0.5)
+  return str(fake_slurm/"submit_array_job.sh")
+
+def test_prenacs_api_batch_computing_slurm(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    submitter = use_fake_slurm(monkeypatch, tmpdir, "1_1")
+    monkeypatch.setattr(BatchComputation, "SLURM_FLUSH_INTERVAL", 0)
+    flushed = []
+    flush_collected = BatchComputation._flush_collected
+
+    def recording_flush_collected(self, filenames):
+      consumed = list(filenames)
+      flush_collected(self, filenames)
+      assert(not any(os.path.exists(f) for f in consumed))
+      flushed.append(len(computed_ids(self.outfile.name)))
+    monkeypatch.setattr(BatchComputation, "_flush_collected",
+                        recording_flush_collected)
+    failuresfilename = os.path.join(tmpdir, "failures.tsv")
+    bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_slurm_params(str(TESTDATA/"failing_plugin.py"), submitter,
+                        os.path.join(tmpdir, "out"), units_per_task=2)
+    bc.set_failure_params(continue_on_error=True,
+                          failuresfilename=failuresfilename)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="slurm", verbose=ECHO)
+      bc.finalize()
+      assert(computed_ids(outfilename) == ["1", "5", "7", "9"])
+      assert(flushed[0] == 1 and flushed[-1] == 4)
+      check_report(reportfilename, "failing", "1.0", 4, "partial")
+      check_n_failed_units(reportfilename, 5)
+    with open(failuresfilename) as f:
+      assert(sorted(line.split("\t")[0] for line in f) == ["2", "6", "8"])
+    with open("failed_tasks_1.err") as f:
+      assert(f.read() == "3\tFAILED\t1\n4\tFAILED\t1\n")
+    assert(not os.path.exists(os.path.join(tmpdir, "out")))
+
+def test_prenacs_api_batch_computing_slurm_unit_failures(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    submitter = use_fake_slurm(monkeypatch, tmpdir, "")
+    bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_slurm_params(str(TESTDATA/"failing_plugin.py"), submitter,
+                        os.path.join(tmpdir, "out"), units_per_task=3)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="slurm", verbose=ECHO)
+      bc.finalize()
+      assert(computed_ids(outfilename) == ["1", "3", "5", "7", "9"])
+      check_report(reportfilename, "failing", "1.0", 5, "partial")
+      check_n_failed_units(reportfilename, 4)
+    with open("failed_tasks_1.err") as f:
+      assert(sorted(f.readlines()) == ["2\tFAILED\t0\n", "4\tFAILED\t1\n",
+                                       "6\tFAILED\t1\n", "8\tFAILED\t2\n"])
+    assert(not os.path.exists(os.path.join(tmpdir, "out")))
+
+def test_prenacs_api_batch_computing_slurm_resubmission(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    submitter = use_fake_slurm(monkeypatch, tmpdir, "1_1 1_3 2_1")
+    failuresfilename = os.path.join(tmpdir, "failures.tsv")
+    bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_slurm_params(str(TESTDATA/"failing_plugin.py"), submitter,
+                        os.path.join(tmpdir, "out"), units_per_task=2,
+                        max_resubmissions=1,
+                        resubmission_options=[["--mem-per-cpu=2G"]])
+    bc.set_failure_params(continue_on_error=True,
+                          failuresfilename=failuresfilename)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="slurm", verbose=ECHO)
+      bc.finalize()
+      check_report(reportfilename, "failing", "1.0", 4, "partial")
+      check_n_failed_units(reportfilename, 5)
+      assert(computed_ids(outfilename) == ["1", "3", "5", "9"])
+    with open(failuresfilename) as f:
+      assert(sorted(line.split("\t")[0] for line in f) == ["2", "4", "6"])
+    assert(not os.path.exists("failed_tasks_1.err"))
+    with open("failed_tasks_2.err") as f:
+      assert(f.read() == "7\tFAILED\t1\n8\tFAILED\t1\n")
+    with open(os.path.join(tmpdir, "jobs", "2.args")) as f:
+      args = f.read().split()
+    assert("--mem-per-cpu=2G" in args and "0-1" in args)
+
+def test_prenacs_api_batch_computing_slurm_resubmission_failed(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    # all tasks of the last resubmission fail
+    submitter = use_fake_slurm(monkeypatch, tmpdir, "1_1 2_0")
+    failuresfilename = os.path.join(tmpdir, "failures.tsv")
+    bc = BatchComputation(str(TESTDATA/"failing_plugin.py"))
+    bc.input_from_idsfile(str(TESTDATA/"ids.tsv"), verbose=ECHO)
+    bc.set_slurm_params(str(TESTDATA/"failing_plugin.py"), submitter,
+                        os.path.join(tmpdir, "out"), units_per_task=2,
+                        max_resubmissions=1)
+    bc.set_failure_params(continue_on_error=True,
+                          failuresfilename=failuresfilename)
+    with outfiles(bc) as (outfilename, logfilename, reportfilename):
+      bc.run(mode="slurm", verbose=ECHO)
+      bc.finalize()
+      assert(computed_ids(outfilename) == ["1", "5", "7", "9"])
+      check_report(reportfilename, "failing", "1.0", 4, "partial")
+      check_n_failed_units(reportfilename, 5)
+    assert(not os.path.exists("failed_tasks_1.err"))
+    with open("failed_tasks_2.err") as f:
+      assert(f.read() == "3\tFAILED\t0\n4\tFAILED\t0\n")
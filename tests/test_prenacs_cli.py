@@ -132,3 +132,23 @@ def test_prenacs_cli_batch_computing_ids_with_proc(script_runner):
                    reason="new_attributes")
       check_results(outfilename, str(TESTDATA/"wc_expected.tsv"))
       check_empty_file(logfilename)
+
+@pytest.mark.script_launch_mode('subprocess')
+def test_prenacs_cli_batch_computing_incremental_fused_without_out(
+    script_runner):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    fusedfilename = os.path.join(tmpdir, "fused.yaml")
+    with open(fusedfilename, "w") as f:
+      yaml.dump([{"plugin": str(TESTDATA/"shared_wc_plugin.py"),
+                  "out": os.path.join(tmpdir, "fused1.tsv")},
+                 {"plugin": str(TESTDATA/"shared_wc_plugin.py")}], f)
+    ret = script_runner.run(str(BIN/"prenacs"), "batch-compute",
+                            str(TESTDATA/"wc_from_filename_plugin.sh"),
+                            "files", str(TESTDATA/"*.data"),
+                            "--out", os.path.join(tmpdir, "out.tsv"),
+                            "--incremental", "--fused", fusedfilename,
+                            "--input-loader",
+                            str(TESTDATA/"text_input_loader.py"))
+    assert ret.returncode != 0
+    assert "--fused entry 2" in ret.stderr
+    assert not os.path.exists(os.path.join(tmpdir, "out.tsv"))
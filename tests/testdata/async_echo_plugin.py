@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Echoes the input, using a coroutine compute function, for test purposes;
+the maximal number of concurrently computed units is stored in max_active
+"""
+
+import asyncio
+
+ID =      "async_echo"
+VERSION = "1.0"
+INPUT = "anything"
+OUTPUT =  ["echo"]
+
+active = 0
+max_active = 0
+
+async def compute(unit, **kwargs):
+  global active, max_active
+  active += 1
+  max_active = max(max_active, active)
+  await asyncio.sleep(0.01)
+  active -= 1
+  return [unit], None
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Echoes the input, computing the units in batches, for test purposes
+"""
+
+ID =      "batch_echo"
+VERSION = "1.0"
+INPUT = "anything"
+OUTPUT =  ["echo", "batch_size"]
+
+def compute(unit, **kwargs):
+  raise RuntimeError("compute called instead of compute_batch")
+
+def compute_batch(units, **kwargs):
+  return [([unit, len(units)], None) for unit in units]
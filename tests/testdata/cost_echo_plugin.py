@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Echoes the input, for test purposes; the estimated computation cost
+of a numeric ID is the ID value
+"""
+
+ID =      "cost_echo"
+VERSION = "1.0"
+INPUT = "numeric ID"
+OUTPUT =  ["echo"]
+
+def estimate_cost(unit, **kwargs):
+  return int(unit)
+
+def compute(unit, **kwargs):
+  return [unit], None
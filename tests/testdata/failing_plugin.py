@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Echoes the input, failing for even numeric IDs, for test purposes
+"""
+
+ID =      "failing"
+VERSION = "1.0"
+INPUT = "numeric ID"
+OUTPUT =  ["echo"]
+
+def compute(unit, **kwargs):
+  if int(unit) % 2 == 0:
+    raise ValueError(f"even unit:\t{unit}")
+  return [unit], None
@@ -0,0 +1,6 @@
+#!/bin/bash
+#
+# Submitter script for the fake Slurm stand-in (see sbatch)
+#
+${PRENACS:-prenacs} array-task --units-per-task $5 --processes $6 \
+  $1 $2 $3 $SLURM_ARRAY_TASK_ID $4
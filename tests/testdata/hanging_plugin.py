@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Echoes the input, for test purposes, except for some units:
+- 3: sleeps for a long time (interruptible)
+- 5: terminates the process
+- 7: sleeps for a long time, ignoring interruptions (as native code could do)
+"""
+
+import os
+import time
+import signal
+
+ID =      "hanging"
+VERSION = "1.0"
+INPUT = "numeric ID"
+OUTPUT =  ["echo"]
+
+def compute(unit, **kwargs):
+  if unit == "3":
+    time.sleep(60)
+  elif unit == "5":
+    os._exit(1)
+  elif unit == "7":
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+    time.sleep(60)
+  return [unit], None
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Counts lines and bytes of a (optionally gzipped) file,
+mapped in memory, for test purposes
+"""
+
+from prenacs.input_buffer import mapped_input, count
+
+ID="mapped_wc"
+VERSION="1.0"
+INPUT="filename"
+OUTPUT=["lines", "bytes"]
+
+def compute(filename, cachedir=None, **kwargs):
+  with mapped_input(filename, cachedir=cachedir) as data:
+    return [count(data, b"\n"), len(data)], ""
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Counts lines, words and bytes of the input loaded by text_input_loader.py
+(bytes, or a memoryview if preloaded), for test purposes
+"""
+
+ID="shared_wc"
+VERSION="1.0"
+INPUT="file content (shared input)"
+OUTPUT=["lines", "words", "bytes"]
+SHARED_INPUT=True
+
+def compute(content, **kwargs):
+  content = bytes(content)
+  return [content.count(b"\n"), len(content.split()), len(content)], ""
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Loads the content of an input file, for test purposes,
+except for input3.data: sleeps for a long time (interruptible)
+"""
+
+import time
+
+def load_input(filename):
+  if filename.endswith("input3.data"):
+    time.sleep(60)
+  with open(filename, "rb") as f:
+    return f.read()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Echoes the input, for test purposes, except for some units:
+- 1: raises an exception (after some time, while unit 2 is submitted)
+- 2: sleeps for a long time, ignoring interruptions (as native code could do)
+"""
+
+import time
+import signal
+
+ID =      "stuck"
+VERSION = "1.0"
+INPUT = "numeric ID"
+OUTPUT =  ["echo"]
+
+def compute(unit, **kwargs):
+  if unit == "1":
+    time.sleep(0.5)
+    raise ValueError("unit 1 failed")
+  elif unit == "2":
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+    time.sleep(60)
+  return [unit], None
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+
+#
+# (c) 2021-2023 Giorgio Gonnella, University of Goettingen, Germany
+#
+
+"""
+Loads the content of an input file, for test purposes
+"""
+
+def load_input(filename):
+  with open(filename, "rb") as f:
+    return f.read()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+"""
+Counts the units computed by each process, for test purposes
+"""
+
+import os
+
+ID =      "worker_state"
+VERSION = "1.0"
+INPUT = "anything"
+OUTPUT =  ["pid"]
+
+def initialize(outdir=None, **kwargs):
+  return {"pid": os.getpid(), "outdir": outdir, "n_units": 0}
+
+def finalize(state):
+  if state["outdir"]:
+    with open(os.path.join(state["outdir"], str(state["pid"])), "w") as f:
+      f.write(str(state["n_units"]))
+
+def compute(unit, state=None, **kwargs):
+  state["n_units"] += 1
+  return [state["pid"]], None